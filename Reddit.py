@@ -1,52 +1,26 @@
-import os
-import json
 import time
 import pymysql
 from bs4 import BeautifulSoup
-from dotenv import load_dotenv
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from google.cloud import language_v1
-
-# ✅ 指定 ChromeDriver 絕對路徑
-CHROMEDRIVER_PATH = "google_driver/chromedriver-linux64/chromedriver"
-
-# 讀取環境變數
-load_dotenv()
-MYSQL_HOST = os.getenv('MARIADB_HOST')
-MYSQL_USER = os.getenv('MARIADB_USER')
-MYSQL_PASSWORD = os.getenv('MARIADB_PASSWORD')
-MYSQL_DB = os.getenv('MARIADB_DB')
-
-# 設定 Selenium 瀏覽器選項
-options = webdriver.ChromeOptions()
-options.add_argument("--headless")  # ✅ 不開啟視窗模式
-options.add_argument("--no-sandbox")  
-options.add_argument("--disable-dev-shm-usage")  
-options.add_argument("--user-data-dir=/tmp/chrome-user-data")  
-options.add_argument(
-    "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.45 Safari/537.36"
-)
-
-# 設定 Google NLP API 客戶端
-client = language_v1.LanguageServiceClient()
-
-# 連接 MariaDB
-def connect_to_db():
-    try:
-        conn = pymysql.connect(
-            host=MYSQL_HOST,
-            user=MYSQL_USER,
-            password=MYSQL_PASSWORD,
-            database=MYSQL_DB,
-            charset="utf8mb4",
-            autocommit=True
-        )
-        return conn
-    except pymysql.MySQLError as e:
-        print(f"❌ MySQL 連線錯誤: {e}")
-        return None
+import archive
+import dedup
+import search
+import config
+from config import connect_to_db, load_keywords
+from sentiment import analyze_sentiment
+
+# 設定 Selenium 瀏覽器選項（selenium 載入較慢，建立瀏覽器時才匯入）
+def build_chrome_options():
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless")  # ✅ 不開啟視窗模式
+    options.add_argument("--no-sandbox")  
+    options.add_argument("--disable-dev-shm-usage")  
+    options.add_argument("--user-data-dir=/tmp/chrome-user-data")  
+    options.add_argument(
+        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.45 Safari/537.36"
+    )
+    return options
 
 # 確保資料表存在
 def create_table():
@@ -73,18 +47,6 @@ def create_table():
         finally:
             conn.close()
 
-# 使用 Google NLP 進行情感分析
-def analyze_sentiment(text):
-    if not text.strip():
-        return 0.0
-    document = language_v1.Document(content=text, type_=language_v1.Document.Type.PLAIN_TEXT)
-    try:
-        sentiment = client.analyze_sentiment(request={'document': document}).document_sentiment
-        return round(sentiment.score, 6)
-    except Exception as e:
-        print(f"⚠️ Google NLP API 錯誤: {e}")
-        return 0.0
-
 # 儲存至 MariaDB
 def save_to_db(title, content, comment, sentiment_score, site, search_keyword, capture_date):
     conn = connect_to_db()
@@ -98,71 +60,129 @@ def save_to_db(title, content, comment, sentiment_score, site, search_keyword, c
             cur.execute(sql_query, (title, content, comment, sentiment_score, site, search_keyword, capture_date))
             conn.commit()
             print(f"✅ 已儲存: {title[:30]} - {comment[:30]}...")
+            return cur.lastrowid
         except pymysql.MySQLError as e:
             print(f"❌ MySQL 錯誤: {e}")
         finally:
             conn.close()
 
-# 讀取關鍵字
-def load_keywords(filename="keywords.txt"):
-    try:
-        with open(filename, "r", encoding="utf-8") as file:
-            return [line.strip() for line in file.readlines() if line.strip()]
-    except FileNotFoundError:
-        print(f"❌ 關鍵字檔案 {filename} 不存在")
-        return []
-
-# 抓取 Reddit 文章
-def fetch_reddit_articles(query):
+# 頁面上找不到內文 / 留言時填入的文字
+NO_CONTENT = "無法抓取內容"
+NO_COMMENTS = "沒有找到留言"
+
+# 解析 Reddit 文章頁面 HTML，取出內文與留言（不連網，重新解析封存資料時也用這個）
+def extract_post(html):
+    post_soup = BeautifulSoup(html, "html.parser")
+
+    # 解析文章內容
+    content_element = post_soup.find("div", {"id": lambda x: x and x.startswith('t3_')})
+    content = content_element.get_text(strip=True) if content_element else NO_CONTENT
+
+    # 解析留言
+    comments_section = post_soup.find_all("div", {"id": lambda x: x and "comment" in x})
+    comments = [c.get_text(strip=True) for c in comments_section if c.get_text(strip=True)]
+    comments = comments[:10] if comments else [NO_COMMENTS]
+
+    return {"content": content, "comments": comments}
+
+# 頁面沒有內文也沒有留言（例如被擋）時不存入資料庫，也不算處理過
+def is_blocked(post_data):
+    return post_data["content"] == NO_CONTENT and post_data["comments"] == [NO_COMMENTS]
+
+# 抓取 Reddit 文章；有傳入 seen 時略過已處理過的文章並把新網址加入 seen
+# 回傳 (本次處理成功的文章網址, 開啟的頁面數)；頁面沒有內文也沒有留言（例如被擋）時不算處理成功，也不存入資料庫
+def fetch_reddit_articles(query, seen=None):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
     today = time.strftime("%Y-%m-%d")
-    service = Service(CHROMEDRIVER_PATH)
-    driver = webdriver.Chrome(service=service, options=options)
+    service = Service(config.CHROMEDRIVER_PATH)
+    driver = webdriver.Chrome(service=service, options=build_chrome_options())
+    processed, pages = [], 0
 
     try:
         print(f"🔍 搜索 Reddit: {query}")
-        driver.get(f"https://www.reddit.com/search/?q={query}")
+        search_url = f"https://www.reddit.com/search/?q={query}"
+        driver.get(search_url)
+        pages += 1
 
         time.sleep(5)  # 等待頁面載入
-        soup = BeautifulSoup(driver.page_source, "html.parser")
+        search_html = driver.page_source
+        soup = BeautifulSoup(search_html, "html.parser")
         posts = soup.find_all("a", {"data-testid": "post-title"})[:20]  # ✅ 限制最多 20 篇文章
 
         print(f"📌 找到 {len(posts)} 則 Reddit 文章")
+        archive.append_capture(
+            "reddit", "search", query, search_url, search_html,
+            [{"title": post.get_text(strip=True), "url": "https://www.reddit.com" + post['href']} for post in posts],
+            capture_date=today
+        )
 
         for post in posts:
             title = post.get_text(strip=True)
             link = "https://www.reddit.com" + post['href']
+            if seen is not None and link in seen:
+                continue
 
             driver.get(link)
+            pages += 1
             time.sleep(5)
-            post_soup = BeautifulSoup(driver.page_source, "html.parser")
-
-            # 解析文章內容
-            content_element = post_soup.find("div", {"id": lambda x: x and x.startswith('t3_')})
-            content = content_element.get_text(strip=True) if content_element else "無法抓取內容"
-
-            # 解析留言
-            comments_section = post_soup.find_all("div", {"id": lambda x: x and "comment" in x})
-            comments = [c.get_text(strip=True) for c in comments_section if c.get_text(strip=True)]
-            comments = comments[:10] if comments else ["沒有找到留言"]
+            post_html = driver.page_source
+            post_data = extract_post(post_html)
+            content, comments = post_data["content"], post_data["comments"]
+            # 被擋的頁面另存為 "blocked"，重新處理與排程推估都只看 "post"
+            blocked = is_blocked(post_data)
+            archive.append_capture("reddit", "blocked" if blocked else "post", query, link, post_html, post_data,
+                                   meta={"title": title}, capture_date=today)
+            if blocked:
+                print(f"⚠️ 無法取得文章內容，下次再試: {link}")
+                continue
 
             # ✅ 即時儲存文章 & 留言
             for comment in comments:
-                sentiment_score = analyze_sentiment(comment)
-                save_to_db(title, content, comment, sentiment_score, "Reddit", query, today)
+                scored = dedup.score_text(comment)
+                row_id = save_to_db(title, content, comment, scored["score"], "Reddit", query, today)
+                dedup.link(scored, "reddit", "comment", row_id, today)
+                search.index_row("reddit", row_id, query, today, None, title, content, comment, scored["score"])
+
+            processed.append(link)
+            if seen is not None:
+                seen.add(link)
 
         print(f"✅ 關鍵字 {query} 處理完成！")
     except Exception as e:
         print(f"❌ 發生錯誤: {e}")
     finally:
         driver.quit()  # ✅ 確保 Selenium 關閉
+    return processed, pages
+
+# 供 scheduler.py 輪詢：回傳 (新文章網址, 發出的請求數)
+def poll(keyword, seen):
+    return fetch_reddit_articles(keyword, seen)
+
+# 重新處理一筆封存資料（供 rescore.py 使用，不會連線到 Reddit）
+def rescore_capture(entry, reparse=False):
+    if entry["kind"] != "post":
+        return 0
+
+    post_data = extract_post(entry["raw"]) if reparse else entry["records"]
+    if is_blocked(post_data):
+        return 0
+    title = entry["meta"].get("title", "")
+    for comment in post_data["comments"]:
+        sentiment_score = analyze_sentiment(comment)
+        row_id = save_to_db(title, post_data["content"], comment, sentiment_score, "Reddit", entry["keyword"], entry["capture_date"])
+        search.index_row("reddit", row_id, entry["keyword"], entry["capture_date"], None, title, post_data["content"],
+                         comment, sentiment_score)
+    return len(post_data["comments"])
 
 # 主程式
-def main():
+def main(keywords_file="keywords.txt"):
     create_table()
 
-    keywords = load_keywords()
+    keywords = load_keywords(keywords_file)
     if not keywords:
-        print("❌ 關鍵字清單為空，請檢查 keywords.txt")
+        print(f"❌ 關鍵字清單為空，請檢查 {keywords_file}")
         return
 
     for keyword in keywords:
@@ -0,0 +1,149 @@
+import os
+import json
+import fcntl
+from datetime import date, datetime
+import zstandard
+import config
+
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024  # 單一分段檔超過 64MB 就換新檔
+COMPRESSION_LEVEL = 10
+
+# 封存格式：
+#   archive/<抓取日期>/<來源>-<序號>.jsonl.zst  每筆資料壓成一個獨立的 zstd frame，
+#                                                整個檔案仍可用 zstdcat 直接還原成 JSONL
+#   archive/<抓取日期>/<來源>-<序號>.idx        每行一筆 {"offset", "length", "kind", "keyword", "url"}，
+#                                                可直接定位到單筆資料而不必解壓整個分段
+SEGMENT_SUFFIX = ".jsonl.zst"
+INDEX_SUFFIX = ".idx"
+
+_compressor = None
+
+
+def _get_compressor():
+    global _compressor
+    if _compressor is None:
+        _compressor = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL)
+    return _compressor
+
+
+# 找出目前可寫入的分段檔（超過大小上限就開新的序號）
+def _current_segment(site, capture_date):
+    day_dir = os.path.join(config.ARCHIVE_DIR, capture_date)
+    os.makedirs(day_dir, exist_ok=True)
+
+    prefix = f"{site}-"
+    seqs = [
+        int(name[len(prefix):-len(SEGMENT_SUFFIX)])
+        for name in os.listdir(day_dir)
+        if name.startswith(prefix) and name.endswith(SEGMENT_SUFFIX) and name[len(prefix):-len(SEGMENT_SUFFIX)].isdigit()
+    ]
+    seq = max(seqs) if seqs else 0
+    path = os.path.join(day_dir, f"{site}-{seq:05d}{SEGMENT_SUFFIX}")
+    if os.path.exists(path) and os.path.getsize(path) >= SEGMENT_MAX_BYTES:
+        path = os.path.join(day_dir, f"{site}-{seq + 1:05d}{SEGMENT_SUFFIX}")
+    return path
+
+
+# 將抓到的原始頁面 / API 回應與解析結果附加到封存檔
+#   kind    : 資料種類，例如 "search"、"article"、"comments"
+#   raw     : 原始 HTML 字串或 API 回應（可轉成 JSON 的物件）
+#   records : 當次解析出的資料
+#   meta    : 重新解析時需要、但原始頁面中沒有的資訊（例如搜尋結果上的標題）
+def append_capture(site, kind, keyword, url, raw, records, meta=None, capture_date=None):
+    capture_date = capture_date or date.today().isoformat()
+    entry = {
+        "site": site,
+        "kind": kind,
+        "keyword": keyword,
+        "url": url,
+        "capture_date": capture_date,
+        "fetched_at": datetime.now().isoformat(timespec="seconds"),
+        "meta": meta or {},
+        "raw": raw,
+        "records": records,
+    }
+    try:
+        line = json.dumps(entry, ensure_ascii=False).encode("utf-8") + b"\n"
+        frame = _get_compressor().compress(line)
+
+        path = _current_segment(site, capture_date)
+        index_path = path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+        with open(path, "ab") as f:
+            # 常駐排程與排程器單次執行可能同時寫入同一個分段，鎖住分段檔直到索引也寫完，
+            # 確保取得的位移與寫入的 frame 一致
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0, os.SEEK_END)
+                offset = f.tell()
+                f.write(frame)
+                f.flush()
+                with open(index_path, "a", encoding="utf-8") as index_file:
+                    index_file.write(json.dumps({
+                        "offset": offset,
+                        "length": len(frame),
+                        "kind": kind,
+                        "keyword": keyword,
+                        "url": url,
+                    }, ensure_ascii=False) + "\n")
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    except (OSError, TypeError, ValueError) as e:
+        # 封存失敗不影響爬蟲本身
+        print(f"⚠️ 封存原始資料失敗: {e}")
+
+
+# 列出日期範圍內的分段檔（日期格式 YYYY-MM-DD，含頭尾）
+def list_segments(since=None, until=None, sites=None):
+    if not os.path.isdir(config.ARCHIVE_DIR):
+        return []
+
+    segments = []
+    for day in sorted(os.listdir(config.ARCHIVE_DIR)):
+        if since and day < since:
+            continue
+        if until and day > until:
+            continue
+        day_dir = os.path.join(config.ARCHIVE_DIR, day)
+        if not os.path.isdir(day_dir):
+            continue
+        for name in sorted(os.listdir(day_dir)):
+            if not name.endswith(SEGMENT_SUFFIX):
+                continue
+            site = name.rsplit("-", 1)[0]
+            if sites and site not in sites:
+                continue
+            segments.append(os.path.join(day_dir, name))
+    return segments
+
+
+# 讀取分段檔的位移索引
+def read_index(segment_path):
+    index_path = segment_path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        print(f"⚠️ 找不到索引檔 {index_path}")
+        return []
+
+
+# 依索引讀出指定的幾筆資料
+def read_captures(segment_path, index_entries):
+    decompressor = zstandard.ZstdDecompressor()
+    with open(segment_path, "rb") as f:
+        for item in index_entries:
+            f.seek(item["offset"])
+            frame = f.read(item["length"])
+            try:
+                yield json.loads(decompressor.decompress(frame))
+            except (zstandard.ZstdError, ValueError) as e:
+                print(f"⚠️ 封存資料損毀 {segment_path}@{item['offset']}: {e}")
+
+
+# 逐筆讀出日期範圍內的所有封存資料
+def iter_captures(since=None, until=None, sites=None, kinds=None):
+    for segment_path in list_segments(since, until, sites):
+        index_entries = read_index(segment_path)
+        if kinds:
+            index_entries = [item for item in index_entries if item["kind"] in kinds]
+        yield from read_captures(segment_path, index_entries)
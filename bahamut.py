@@ -1,55 +1,14 @@
-import os
 import time
 import random
 from datetime import date
 import pymysql
-from dotenv import load_dotenv
-from google.cloud import language_v1
-from google.cloud.language_v1 import Document
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-
-# 讀取 .env 設定檔
-load_dotenv()
-
-# 資料庫連線參數
-MYSQL_HOST = os.getenv('MARIADB_HOST')
-MYSQL_USER = os.getenv('MARIADB_USER')
-MYSQL_PASSWORD = os.getenv('MARIADB_PASSWORD')
-MYSQL_DB = os.getenv('MARIADB_DB')
-
-# Google NLP API：情感分析
-def analyze_sentiment(text):
-    if not text.strip():
-        return 0.0
-    client = language_v1.LanguageServiceClient()
-    document = Document(content=text, type_=language_v1.Document.Type.PLAIN_TEXT)
-    try:
-        sentiment = client.analyze_sentiment(request={'document': document}).document_sentiment
-        return round(sentiment.score, 6)
-    except Exception as e:
-        print(f"⚠️ Google NLP API 錯誤: {e}")
-        return 0.0
-
-# MySQL 連線
-def connect_to_db():
-    try:
-        conn = pymysql.connect(
-            host=MYSQL_HOST,
-            user=MYSQL_USER,
-            password=MYSQL_PASSWORD,
-            database=MYSQL_DB,
-            charset="utf8mb4"
-        )
-        return conn
-    except pymysql.MySQLError as e:
-        print(f"MySQL 連線錯誤: {e}")
-        return None
+from bs4 import BeautifulSoup
+import archive
+import dedup
+import search
+import config
+from config import connect_to_db, load_keywords
+from sentiment import analyze_sentiment
 
 # 建立資料表（若不存在）
 def create_bahamut_table_if_not_exist():
@@ -81,7 +40,7 @@ def create_bahamut_table_if_not_exist():
             conn.close()
 
 # **即時存入 MySQL**
-def save_bahamut_to_db(data):
+def save_bahamut_to_db(data, pause=True):
     conn = connect_to_db()
     if conn:
         try:
@@ -104,23 +63,34 @@ def save_bahamut_to_db(data):
             ))
             conn.commit()
             print(f"✅ 即時存入資料庫: {data['title'][:30]}...")
-            time.sleep(random.uniform(1, 2))  # 模擬人類
+            if pause:
+                time.sleep(random.uniform(1, 2))  # 模擬人類
+            return cur.lastrowid
         except pymysql.MySQLError as e:
             print(f"❌ 儲存資料時發生錯誤: {e}")
         finally:
             conn.close()
 
-# 設定 Selenium
+# 設定 Selenium（selenium 載入較慢，建立瀏覽器時才匯入）
 def init_driver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
     chrome_options = Options()
     chrome_options.add_argument("--headless")
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
-    service = Service("google_driver/chromedriver-linux64/chromedriver")
+    service = Service(config.CHROMEDRIVER_PATH)
     return webdriver.Chrome(service=service, options=chrome_options)
 
 # 搜尋巴哈
 def search_bahamut(driver, keyword):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.keys import Keys
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
     driver.get("https://search.gamer.com.tw/")
     try:
         WebDriverWait(driver, 10).until(
@@ -134,9 +104,23 @@ def search_bahamut(driver, keyword):
     except Exception as e:
         print("❌ 搜尋巴哈失敗:", e)
 
+# 以 BeautifulSoup 解析已存下的文章頁面（與 parse_detail_page 使用相同的選取條件，供重新解析封存資料）
+def extract_detail(html):
+    soup = BeautifulSoup(html, "html.parser")
+
+    divs = [d for d in soup.find_all("div") if "== $0" in "".join(d.find_all(string=True, recursive=False))]
+    content = "\n".join([d.get_text().strip() for d in divs if d.get_text().strip()])
+
+    spans = soup.select('span.comment_content[data-formatted="yes"]')
+    comments = "\n".join([sp.get_text().strip() for sp in spans if sp.get_text().strip()])
+
+    return {"content": content, "comments": comments}
+
 # 解析文章內容
 def parse_detail_page(driver, url):
-    result = {"content": "", "comments": "", "article_url": url}
+    from selenium.webdriver.common.by import By
+
+    result = {"content": "", "comments": "", "article_url": url, "html": ""}
     try:
         driver.execute_script("window.open(arguments[0]);", url)
         driver.switch_to.window(driver.window_handles[-1])
@@ -148,6 +132,8 @@ def parse_detail_page(driver, url):
         spans = driver.find_elements(By.CSS_SELECTOR, 'span.comment_content[data-formatted="yes"]')
         result["comments"] = "\n".join([sp.text.strip() for sp in spans if sp.text.strip()])
 
+        result["html"] = driver.page_source
+
     except Exception as e:
         print("❌ 解析文章失敗:", e)
     finally:
@@ -155,42 +141,103 @@ def parse_detail_page(driver, url):
         driver.switch_to.window(driver.window_handles[0])
     return result
 
-# 爬取巴哈搜尋結果
-def crawl_search_results(driver, keyword, max_page=2):
+# 爬取巴哈搜尋結果；有傳入 seen 時略過已處理過的文章並把新網址加入 seen
+# 回傳 (本次處理成功的文章網址, 開啟的文章頁數)；無法開啟的文章不加入 seen，下次再試
+def crawl_search_results(driver, keyword, max_page=2, seen=None):
+    from selenium.webdriver.common.by import By
+
     today = date.today().isoformat()
+    processed, pages = [], 0
     for page_num in range(1, max_page + 1):
         print(f"=== 抓取第 {page_num} 頁 ===")
         title_links = driver.find_elements(By.CSS_SELECTOR, 'div.gs-title > a.gs-title')
+        archive.append_capture(
+            "bahamut", "search", keyword, driver.current_url, driver.page_source,
+            [{"title": link.text.strip(), "url": link.get_attribute('href')} for link in title_links],
+            capture_date=today
+        )
         for link in title_links:
             title_text = link.text.strip()
             detail_url = link.get_attribute('href')
             if not detail_url:
                 continue
+            if seen is not None and detail_url in seen:
+                continue
 
             detail_data = parse_detail_page(driver, detail_url)
+            pages += 1
+            if not detail_data["html"]:
+                continue
+            processed.append(detail_url)
+            if seen is not None:
+                seen.add(detail_url)
+            archive.append_capture(
+                "bahamut", "article", keyword, detail_url, detail_data["html"],
+                {"content": detail_data["content"], "comments": detail_data["comments"]},
+                meta={"title": title_text}, capture_date=today
+            )
             if detail_data["content"] or detail_data["comments"]:
-                content_score = analyze_sentiment(detail_data["content"])
-                comment_score = analyze_sentiment(detail_data["comments"])
+                content_scored = dedup.score_text(detail_data["content"])
+                comment_scored = dedup.score_text(detail_data["comments"])
                 data = {
                     "article_url": detail_data["article_url"],
                     "title": title_text,
                     "content": detail_data["content"],
                     "comments": detail_data["comments"],
-                    "content_sentiment_score": content_score,
-                    "comment_sentiment_score": comment_score,
+                    "content_sentiment_score": content_scored["score"],
+                    "comment_sentiment_score": comment_scored["score"],
                     "site": "bahamut",
                     "search_keyword": keyword,
                     "capture_date": today
                 }
-                save_bahamut_to_db(data)
+                row_id = save_bahamut_to_db(data)
+                dedup.link(content_scored, "bahamut", "content", row_id, today)
+                dedup.link(comment_scored, "bahamut", "comment", row_id, today)
+                search.index_row("bahamut", row_id, keyword, today, data["article_url"], title_text, data["content"],
+                                 data["comments"], data["comment_sentiment_score"], data["content_sentiment_score"])
 
         time.sleep(random.uniform(2, 4))  # 模擬人類
+    return processed, pages
 
-def main():
+# 供 scheduler.py 輪詢：回傳 (新文章網址, 發出的請求數)
+def poll(keyword, seen):
+    driver = init_driver()
+    try:
+        search_bahamut(driver, keyword)
+        new_urls, pages = crawl_search_results(driver, keyword, seen=seen)
+    finally:
+        driver.quit()
+    return new_urls, 1 + pages
+
+# 重新處理一筆封存資料（供 rescore.py 使用，不會連線到巴哈）
+def rescore_capture(entry, reparse=False):
+    if entry["kind"] != "article":
+        return 0
+
+    detail_data = extract_detail(entry["raw"]) if reparse else entry["records"]
+    if not (detail_data["content"] or detail_data["comments"]):
+        return 0
+
+    data = {
+        "article_url": entry["url"],
+        "title": entry["meta"].get("title", ""),
+        "content": detail_data["content"],
+        "comments": detail_data["comments"],
+        "content_sentiment_score": analyze_sentiment(detail_data["content"]),
+        "comment_sentiment_score": analyze_sentiment(detail_data["comments"]),
+        "site": "bahamut",
+        "search_keyword": entry["keyword"],
+        "capture_date": entry["capture_date"]
+    }
+    row_id = save_bahamut_to_db(data, pause=False)
+    search.index_row("bahamut", row_id, entry["keyword"], entry["capture_date"], data["article_url"], data["title"],
+                     data["content"], data["comments"], data["comment_sentiment_score"], data["content_sentiment_score"])
+    return 1
+
+def main(keywords_file="keywords.txt"):
     create_bahamut_table_if_not_exist()
     driver = init_driver()
-    with open('keywords.txt', 'r', encoding='utf-8') as f:
-        keywords = [k.strip() for k in f.readlines() if k.strip()]
+    keywords = load_keywords(keywords_file)
     for keyword in keywords:
         search_bahamut(driver, keyword)
         crawl_search_results(driver, keyword)
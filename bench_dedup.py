@@ -0,0 +1,55 @@
+import time
+import random
+import argparse
+import resource
+from dedup import NearDuplicateIndex, simhash
+
+# 近似重複索引基準測試：建立數百萬筆隨機指紋，量測加入速度、查詢延遲與記憶體用量
+
+
+def flip_bits(fingerprint, count):
+    for bit in random.sample(range(64), count):
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="量測近似重複索引在大量指紋下的查詢成本")
+    parser.add_argument("--size", type=int, default=2_000_000, help="索引中的指紋數量")
+    parser.add_argument("--queries", type=int, default=100_000, help="查詢次數")
+    parser.add_argument("--max-distance", type=int, default=3, help="漢明距離門檻")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    index = NearDuplicateIndex(args.max_distance)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t = time.perf_counter()
+    for i in range(args.size):
+        index.add(random.getrandbits(64), 0.0, 0, 0, i)
+    build_time = time.perf_counter() - t
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"建立索引: {args.size:,} 筆，{build_time:.1f} 秒（{args.size / build_time:,.0f} 筆/秒），"
+          f"常駐記憶體增加約 {(rss_after - rss_before) / 1024:,.0f} MB")
+
+    # 未命中：隨機指紋；命中：既有指紋翻轉門檻內的位元數
+    misses = [random.getrandbits(64) for _ in range(args.queries)]
+    hits = [flip_bits(index.fingerprints[random.randrange(args.size)], random.randint(0, args.max_distance))
+            for _ in range(args.queries)]
+
+    for label, queries in (("未命中", misses), ("命中", hits)):
+        t = time.perf_counter()
+        found = sum(1 for fingerprint in queries if index.lookup(fingerprint) is not None)
+        elapsed = time.perf_counter() - t
+        print(f"查詢（{label}）: 平均 {elapsed / len(queries) * 1e6:.1f} µs/次，找到 {found:,}/{len(queries):,}")
+
+    text = "今天的新聞又在討論臉書和 IG 的新功能，大家覺得怎麼樣？" * 10
+    t = time.perf_counter()
+    for _ in range(1000):
+        simhash(text)
+    print(f"計算指紋（{len(text)} 字）: 平均 {(time.perf_counter() - t):.3f} ms/次")
+
+
+if __name__ == "__main__":
+    main()
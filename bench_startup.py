@@ -0,0 +1,66 @@
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+# 啟動時間基準測試：每個模組都在全新的 Python 行程中匯入，量測匯入耗時，
+# 並檢查匯入後是否誤載了重量級依賴（這些依賴應該只在實際使用時才載入）
+TARGETS = ["crawl", "config", "archive", "rescore", "export", "dedup", "search", "scheduler", "ptt", "yt", "Reddit", "bahamut"]
+HEAVY_DEPENDENCIES = ["google.cloud.language_v1", "googleapiclient.discovery", "selenium.webdriver"]
+
+PROBE = """
+import sys, time
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(f"{{elapsed}}|{{','.join(heavy)}}")
+"""
+
+
+# 在新行程中匯入模組，回傳 (匯入秒數, 已載入的重量級依賴)
+def measure_import(module):
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_DEPENDENCIES)],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "匯入失敗"
+    elapsed, heavy = result.stdout.strip().splitlines()[-1].split("|", 1)
+    return float(elapsed), heavy
+
+
+# 量測整個行程從啟動到結束的時間（例如 python -m crawl --help）
+def measure_command(args):
+    t = time.perf_counter()
+    subprocess.run([sys.executable] + args, capture_output=True)
+    return time.perf_counter() - t
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="量測各模組的匯入時間")
+    parser.add_argument("--repeat", type=int, default=5, help="每個項目重複次數，取中位數")
+    parser.add_argument("--with-deps", action="store_true", help="同時量測重量級依賴本身的匯入時間作為對照")
+    args = parser.parse_args(argv)
+
+    targets = TARGETS + (HEAVY_DEPENDENCIES if args.with_deps else [])
+    print(f"{'模組':<28}{'匯入中位數(ms)':>16}  已載入的重量級依賴")
+    for module in targets:
+        samples, heavy = [], ""
+        for _ in range(args.repeat):
+            elapsed, heavy = measure_import(module)
+            if elapsed is None:
+                break
+            samples.append(elapsed)
+        if not samples:
+            print(f"{module:<28}{'失敗':>16}  {heavy}")
+            continue
+        print(f"{module:<28}{statistics.median(samples) * 1000:>16.1f}  {heavy or '-'}")
+
+    samples = [measure_command(["-m", "crawl", "--help"]) for _ in range(args.repeat)]
+    print(f"{'python -m crawl --help':<28}{statistics.median(samples) * 1000:>16.1f}  (整個行程)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import os
+import pymysql
+from dotenv import load_dotenv
+
+# 共用設定：所有爬蟲都從這裡讀取 .env 與資料庫連線
+MYSQL_HOST = None
+MYSQL_USER = None
+MYSQL_PASSWORD = None
+MYSQL_DB = None
+YOUTUBE_API_KEY = None
+CHROMEDRIVER_PATH = None
+DEDUP_INDEX_FILE = None
+DEDUP_MAX_DISTANCE = None
+SEARCH_INDEX_FILE = None
+ARCHIVE_DIR = None
+EXPORT_STATE_FILE = None
+SCHEDULER_STATE_FILE = None
+SENTIMENT_VERSION = None
+
+
+# 讀取環境變數（可指定 .env 路徑，會覆蓋已讀取的值）
+def load_config(env_file=None):
+    global MYSQL_HOST, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB, YOUTUBE_API_KEY, CHROMEDRIVER_PATH
+    global DEDUP_INDEX_FILE, DEDUP_MAX_DISTANCE, SEARCH_INDEX_FILE, ARCHIVE_DIR, EXPORT_STATE_FILE, SCHEDULER_STATE_FILE
+    global SENTIMENT_VERSION
+    load_dotenv(env_file, override=env_file is not None)
+    MYSQL_HOST = os.getenv('MARIADB_HOST')
+    MYSQL_USER = os.getenv('MARIADB_USER')
+    MYSQL_PASSWORD = os.getenv('MARIADB_PASSWORD')
+    MYSQL_DB = os.getenv('MARIADB_DB')
+    YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
+    CHROMEDRIVER_PATH = os.getenv('CHROMEDRIVER_PATH', "google_driver/chromedriver-linux64/chromedriver")
+    DEDUP_INDEX_FILE = os.getenv('DEDUP_INDEX_FILE', "dedup_index.bin")
+    DEDUP_MAX_DISTANCE = int(os.getenv('DEDUP_MAX_DISTANCE', "3"))  # SimHash 漢明距離在此以內視為近似重複
+    SEARCH_INDEX_FILE = os.getenv('SEARCH_INDEX_FILE', "search_index.db")
+    ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', "archive")  # 封存根目錄
+    EXPORT_STATE_FILE = os.getenv('EXPORT_STATE_FILE', "export_state.json")
+    SCHEDULER_STATE_FILE = os.getenv('SCHEDULER_STATE_FILE', "scheduler_state.json")
+    # 更換情感分析後端或模型時請一併更改，近似重複索引只沿用同一版本算出的分數
+    SENTIMENT_VERSION = os.getenv('SENTIMENT_VERSION', "google-language-v1")
+
+
+load_config()
+
+
+# 連接 MariaDB
+def connect_to_db():
+    try:
+        conn = pymysql.connect(
+            host=MYSQL_HOST,
+            user=MYSQL_USER,
+            password=MYSQL_PASSWORD,
+            database=MYSQL_DB,
+            charset="utf8mb4",
+            autocommit=True
+        )
+        return conn
+    except pymysql.MySQLError as e:
+        print(f"❌ MySQL 連線錯誤: {e}")
+        return None
+
+
+# 讀取關鍵字
+def load_keywords(filename="keywords.txt"):
+    try:
+        with open(filename, "r", encoding="utf-8") as file:
+            return [line.strip() for line in file.readlines() if line.strip()]
+    except FileNotFoundError:
+        print(f"❌ 關鍵字檔案 {filename} 不存在")
+        return []
@@ -0,0 +1,61 @@
+import argparse
+import importlib
+
+# 統一入口：python -m crawl <子命令>
+# 這裡只匯入標準函式庫，爬蟲模組與其依賴（selenium、googleapiclient、google.cloud）在真正執行時才載入
+
+# 子命令 -> (模組, 預設關鍵字檔, 說明)
+SCRAPERS = {
+    "ptt": ("ptt", "keywords.txt", "爬取 PTT 文章與推文"),
+    "yt": ("yt", "keywords_yt.txt", "爬取 YouTube 影片留言"),
+    "reddit": ("Reddit", "keywords.txt", "爬取 Reddit 文章與留言"),
+    "bahamut": ("bahamut", "keywords.txt", "爬取巴哈姆特文章與留言"),
+}
+
+# 子命令 -> (模組, 說明)；其餘參數原樣交給該模組的 main(argv)
+TOOLS = {
+    "rescore": ("rescore", "從封存資料重新解析 / 重新情感分析（參數見 python -m crawl rescore --help）"),
+    "export": ("export", "分批匯出資料為 Parquet / gzip CSV（參數見 python -m crawl export --help）"),
+    "search": ("search", "全文檢索標題、內文與留言（參數見 python -m crawl search --help）"),
+    "daemon": ("scheduler", "常駐輪詢，依關鍵字熱度調整頻率（參數見 python -m crawl daemon --help）"),
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m crawl", description="PTT / YouTube / Reddit / 巴哈姆特 輿情爬蟲")
+    parser.add_argument("--env", help="指定 .env 設定檔路徑（預設讀取目前目錄的 .env）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for name, (_, default_keywords, help_text) in SCRAPERS.items():
+        sub = subparsers.add_parser(name, help=help_text, description=help_text)
+        sub.add_argument("--keywords", default=default_keywords, help=f"關鍵字檔案（預設 {default_keywords}）")
+
+    for name, (_, help_text) in TOOLS.items():
+        subparsers.add_parser(name, help=help_text, add_help=False)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.command in SCRAPERS and extra:
+        parser.error(f"無法辨識的參數: {' '.join(extra)}")
+
+    if args.env:
+        import config
+        config.load_config(args.env)
+
+    if args.command in SCRAPERS:
+        module_name, _, _ = SCRAPERS[args.command]
+        importlib.import_module(module_name).main(args.keywords)
+    else:
+        module_name, _ = TOOLS[args.command]
+        importlib.import_module(module_name).main(extra)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n⏹️ 程式被中斷，結束執行。")
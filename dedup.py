@@ -0,0 +1,313 @@
+import os
+import zlib
+import atexit
+import fcntl
+import struct
+import hashlib
+from array import array
+from collections import Counter
+from datetime import date
+import pymysql
+import config
+from config import connect_to_db
+from sentiment import analyze_sentiment
+
+# 近似重複偵測：以 64 位元 SimHash 作為文字指紋，漢明距離在 DEDUP_MAX_DISTANCE 以內視為同一份內容，
+# 沿用第一次出現時（正本）的情感分數，並在 near_duplicates 資料表記錄與正本的連結
+#
+# 索引把指紋切成 max_distance + 1 段，依鴿籠原理，距離不超過 max_distance 的兩個指紋至少有一段完全相同，
+# 所以只需比對同段相同的候選者。索引檔為固定長度的二進位紀錄，只會附加寫入，多個爬蟲同時執行也不會互相覆蓋
+# 每筆紀錄帶有情感分析版本（config.SENTIMENT_VERSION），載入時略過其他版本的紀錄，換後端後不會沿用舊分數
+
+SITES = ["ptt", "yt", "reddit", "bahamut"]
+FIELDS = ["comment", "content"]
+RECORD = struct.Struct("<QdBBqI")  # 指紋、情感分數、來源、欄位、資料列 id、情感分析版本
+FILE_MAGIC = b"SIMHASH\x02"  # 索引檔開頭，沒有的是舊格式（不含版本）
+SHINGLE_SIZE = 3
+MIN_TEXT_LENGTH = 8  # 太短的文字（例如「推」）指紋沒有意義，直接分析
+
+
+# 只保留文字與數字，忽略空白、標點與推文前綴的差異
+def normalize(text):
+    return "".join(ch for ch in text.lower() if ch.isalnum())
+
+
+# 以字元 3-gram 計算 64 位元 SimHash
+def simhash(text):
+    text = normalize(text)
+    if len(text) < SHINGLE_SIZE:
+        shingles = Counter([text])
+    else:
+        shingles = Counter(text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1))
+
+    total = sum(shingles.values())
+    weights = [0] * 64
+    for shingle, count in shingles.items():
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        while h:
+            low = h & -h
+            weights[low.bit_length() - 1] += count
+            h ^= low
+
+    # 某位元為 1 的權重 > 為 0 的權重，等同於 weights * 2 > total
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight * 2 > total:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+# 將 64 位元切成 n 段，回傳每段的 (位移, 遮罩)
+def _band_ranges(n):
+    ranges, shift = [], 0
+    for i in range(n):
+        width = 64 // n + (1 if i < 64 % n else 0)
+        ranges.append((shift, (1 << width) - 1))
+        shift += width
+    return ranges
+
+
+# 情感分析版本字串轉成 32 位元標記
+def version_tag(version):
+    return zlib.crc32(version.encode("utf-8"))
+
+
+class NearDuplicateIndex:
+    def __init__(self, max_distance=3, version=0):
+        self.max_distance = max_distance
+        self.version = version
+        self.bands = _band_ranges(min(max(max_distance, 0) + 1, 64))
+        self.fingerprints = array("Q")
+        self.scores = array("d")
+        self.sites = array("B")
+        self.fields = array("B")
+        self.row_ids = array("q")
+        # 每一段：段值 -> 最後加入的紀錄；chains 串起同段值的前一筆紀錄（-1 表示結束）
+        self.heads = [{} for _ in self.bands]
+        self.chains = [array("l") for _ in self.bands]
+        self.saved = 0  # 已寫入索引檔的筆數
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def add(self, fingerprint, score, site, field, row_id):
+        idx = len(self.fingerprints)
+        self.fingerprints.append(fingerprint)
+        self.scores.append(score)
+        self.sites.append(site)
+        self.fields.append(field)
+        self.row_ids.append(row_id)
+        for heads, chain, (shift, mask) in zip(self.heads, self.chains, self.bands):
+            key = (fingerprint >> shift) & mask
+            chain.append(heads.get(key, -1))
+            heads[key] = idx
+        return idx
+
+    # 找出距離最近且在門檻內的紀錄，回傳 (紀錄編號, 漢明距離)，找不到回傳 None
+    def lookup(self, fingerprint):
+        best = None
+        fingerprints = self.fingerprints
+        for heads, chain, (shift, mask) in zip(self.heads, self.chains, self.bands):
+            idx = heads.get((fingerprint >> shift) & mask, -1)
+            while idx >= 0:
+                distance = (fingerprint ^ fingerprints[idx]).bit_count()
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    if distance == 0:
+                        return idx, 0
+                    best = (idx, distance)
+                idx = chain[idx]
+        return best
+
+    # 紀錄對應的正本：(來源, 欄位, 資料列 id)
+    def ref(self, idx):
+        return SITES[self.sites[idx]], FIELDS[self.fields[idx]], self.row_ids[idx]
+
+    def load(self, path):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        if data and not data.startswith(FILE_MAGIC):
+            # 舊格式沒有版本標記，無法判斷分數來自哪個後端，移到一旁重新建立
+            os.replace(path, f"{path}.old")
+            print(f"⚠️ 近似重複索引為舊格式，已移至 {path}.old")
+            return
+        records = memoryview(data)[len(FILE_MAGIC):]
+        usable = len(records) - len(records) % RECORD.size  # 忽略寫到一半的最後一筆
+        for *record, version in RECORD.iter_unpack(records[:usable]):
+            if version == self.version:
+                self.add(*record)
+        self.saved = len(self)
+
+    # 只附加本次新增的紀錄；資料列沒有寫入成功（資料列 id 仍為 0）的紀錄不寫入
+    def save(self, path):
+        if self.saved == len(self):
+            return
+        with open(path, "ab") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if f.seek(0, os.SEEK_END) == 0:
+                    f.write(FILE_MAGIC)
+                f.write(b"".join(
+                    RECORD.pack(self.fingerprints[i], self.scores[i], self.sites[i], self.fields[i], self.row_ids[i], self.version)
+                    for i in range(self.saved, len(self)) if self.row_ids[i]
+                ))
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        self.saved = len(self)
+
+
+_index = None
+_table_ready = False
+
+
+# 取得本次執行共用的索引（第一次使用時從檔案載入，程式結束時自動寫回）
+def get_index():
+    global _index
+    if _index is None:
+        _index = NearDuplicateIndex(config.DEDUP_MAX_DISTANCE, version_tag(config.SENTIMENT_VERSION))
+        _index.load(config.DEDUP_INDEX_FILE)
+        print(f"🧬 近似重複索引已載入 {len(_index)} 筆指紋")
+        atexit.register(save_index)
+    return _index
+
+
+def save_index():
+    if _index is not None:
+        try:
+            _index.save(config.DEDUP_INDEX_FILE)
+        except OSError as e:
+            print(f"⚠️ 儲存近似重複索引失敗: {e}")
+
+
+# 情感分析：先查近似重複索引，命中就沿用正本的分數，不再呼叫 Google NLP
+# 新內容立刻加入記憶體中的索引（資料列 id 暫為 0，由 link() 補上），
+# 同一批（例如同一篇文章的洗版推文）後面的重複內容才能比對到前面的
+def score_text(text):
+    result = {"score": None, "fingerprint": None, "match": None, "distance": None, "entry": None}
+    if config.DEDUP_MAX_DISTANCE < 0 or len(normalize(text)) < MIN_TEXT_LENGTH:
+        result["score"] = analyze_sentiment(text)
+        return result
+
+    index = get_index()
+    result["fingerprint"] = simhash(text)
+    found = index.lookup(result["fingerprint"])
+    if found:
+        result["match"], result["distance"] = found
+        result["score"] = index.scores[result["match"]]
+    else:
+        result["score"] = analyze_sentiment(text)
+        result["entry"] = index.add(result["fingerprint"], result["score"], 0, 0, 0)
+    return result
+
+
+# 資料列寫入後呼叫：新內容補上正本的資料列，近似重複則記錄與正本的連結
+# 若正本的資料列沒有寫入成功，第一筆寫入成功的近似重複改當正本
+def link(result, site, field, row_id, capture_date=None):
+    if result["fingerprint"] is None or not row_id:
+        return
+
+    index = get_index()
+    entry = result["entry"] if result["match"] is None else result["match"]
+    if result["match"] is None or not index.row_ids[entry]:
+        index.sites[entry], index.fields[entry], index.row_ids[entry] = SITES.index(site), FIELDS.index(field), row_id
+    else:
+        save_link(site, field, row_id, index.ref(entry), result["distance"], capture_date)
+
+
+# 確保連結資料表存在
+def create_table(conn):
+    global _table_ready
+    if _table_ready:
+        return
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS near_duplicates (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            site VARCHAR(50) NOT NULL,
+            field VARCHAR(20) NOT NULL,
+            row_id INT NOT NULL,
+            canonical_site VARCHAR(50) NOT NULL,
+            canonical_field VARCHAR(20) NOT NULL,
+            canonical_row_id INT NOT NULL,
+            distance TINYINT NOT NULL,
+            capture_date DATE NOT NULL,
+            INDEX (site, row_id),
+            INDEX (canonical_site, canonical_row_id)
+        )
+    """)
+    _table_ready = True
+
+
+# 記錄近似重複資料列與正本的連結
+def save_link(site, field, row_id, canonical, distance, capture_date=None):
+    conn = connect_to_db()
+    if conn:
+        try:
+            create_table(conn)
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO near_duplicates
+                (site, field, row_id, canonical_site, canonical_field, canonical_row_id, distance, capture_date)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """, (site, field, row_id, *canonical, distance, capture_date or date.today().isoformat()))
+            conn.commit()
+            print(f"♻️ 近似重複（距離 {distance}）: {site}#{row_id} -> {canonical[0]}#{canonical[2]}")
+        except pymysql.MySQLError as e:
+            print(f"❌ 儲存近似重複連結時發生錯誤: {e}")
+        finally:
+            conn.close()
+
+
+# 資料列被刪除後呼叫（rescore --replace）：從索引檔移除以這些資料列為正本的紀錄，並刪除相關的連結
+def forget_rows(site, row_ids):
+    row_ids = set(row_ids)
+    if not row_ids:
+        return
+
+    site_code = SITES.index(site)
+    try:
+        with open(config.DEDUP_INDEX_FILE, "r+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                data = f.read()
+                if data.startswith(FILE_MAGIC):
+                    records = memoryview(data)[len(FILE_MAGIC):]
+                    usable = len(records) - len(records) % RECORD.size
+                    kept = []
+                    for offset in range(0, usable, RECORD.size):
+                        _, _, record_site, _, row_id, _ = RECORD.unpack_from(records, offset)
+                        if record_site != site_code or row_id not in row_ids:
+                            kept.append(records[offset:offset + RECORD.size])
+                    # 原地改寫：其他行程以附加模式開檔，等到鎖釋放後會接在新的檔尾
+                    f.seek(0)
+                    f.truncate()
+                    f.write(FILE_MAGIC + b"".join(kept))
+                    print(f"🧬 已從近似重複索引移除 {usable // RECORD.size - len(kept)} 筆")
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"⚠️ 更新近似重複索引失敗: {e}")
+
+    conn = connect_to_db()
+    if conn:
+        try:
+            create_table(conn)
+            cur = conn.cursor()
+            ids = sorted(row_ids)
+            for start in range(0, len(ids), 1000):
+                chunk = ids[start:start + 1000]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cur.execute(f"""
+                    DELETE FROM near_duplicates
+                    WHERE (site = %s AND row_id IN ({placeholders}))
+                       OR (canonical_site = %s AND canonical_row_id IN ({placeholders}))
+                """, [site, *chunk, site, *chunk])
+            conn.commit()
+        except pymysql.MySQLError as e:
+            print(f"❌ 刪除近似重複連結時發生錯誤: {e}")
+        finally:
+            conn.close()
@@ -0,0 +1,211 @@
+import csv
+import gzip
+import json
+import argparse
+import pymysql
+import pymysql.cursors
+import config
+from config import connect_to_db
+
+# 將四個來源的資料表統一成同一組欄位後匯出
+COLUMNS = [
+    "site",                     # ptt / yt / reddit / bahamut
+    "source_id",                # 原資料表的 id
+    "search_keyword",
+    "capture_date",
+    "url",                      # 巴哈文章網址、YouTube 影片網址；PTT / Reddit 沒有存網址
+    "title",
+    "content",                  # YouTube 沒有內文
+    "comment",
+    "sentiment_score",          # 留言的情感分數
+    "content_sentiment_score",  # 巴哈內文分數、YouTube 影片平均分數
+]
+
+# 來源 -> 對應到統一欄位的 SELECT 欄位（順序與 COLUMNS[1:] 相同）
+SITE_QUERIES = {
+    "ptt": ("ptt", "id, search_keyword, capture_date, NULL, title, content, comment, sentiment_score, NULL"),
+    "reddit": ("reddit", "id, search_keyword, capture_date, NULL, title, content, comment, sentiment_score, NULL"),
+    "yt": ("yt", "id, search_keyword, capture_date, CONCAT('https://www.youtube.com/watch?v=', video_id), title, NULL, "
+                 "comment_content, comment_sentiment_score, sentiment_score"),
+    "bahamut": ("bahamut", "id, search_keyword, capture_date, article_url, title, content, comments, "
+                           "comment_sentiment_score, content_sentiment_score"),
+}
+
+CHUNK_SIZE = 5000  # 每次從伺服器取回的筆數，也是 Parquet 每個 row group 的大小
+
+
+# 以伺服器端（不緩衝）游標分批讀取單一來源，記憶體中最多只有一批資料
+#   after_date 與 after_id 同時指定時，略過 (抓取日期, id) 不大於 (after_date, after_id) 的資料列
+def iter_site_rows(conn, site, keyword=None, since=None, until=None, after_id=None, chunk_size=CHUNK_SIZE, after_date=None):
+    table, columns = SITE_QUERIES[site]
+    sql_query = f"SELECT {columns} FROM {table} WHERE 1=1"
+    params = []
+    if keyword:
+        sql_query += " AND search_keyword = %s"
+        params.append(keyword)
+    if since:
+        sql_query += " AND capture_date >= %s"
+        params.append(since)
+    if until:
+        sql_query += " AND capture_date <= %s"
+        params.append(until)
+    if after_date:
+        sql_query += " AND (capture_date > %s OR (capture_date = %s AND id > %s))"
+        params.extend([after_date, after_date, after_id or 0])
+    elif after_id:
+        sql_query += " AND id > %s"
+        params.append(after_id)
+    sql_query += " ORDER BY id"
+
+    cur = conn.cursor(pymysql.cursors.SSCursor)
+    try:
+        cur.execute(sql_query, params)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield [(site,) + row for row in rows]
+    finally:
+        cur.close()
+
+
+# Parquet 輸出：每批資料寫成一個 row group（pyarrow 只在匯出 Parquet 時才載入）
+class ParquetSink:
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema([
+            ("site", pa.string()),
+            ("source_id", pa.int64()),
+            ("search_keyword", pa.string()),
+            ("capture_date", pa.date32()),
+            ("url", pa.string()),
+            ("title", pa.string()),
+            ("content", pa.string()),
+            ("comment", pa.string()),
+            ("sentiment_score", pa.float64()),
+            ("content_sentiment_score", pa.float64()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        arrays = [self.pa.array(column, type=field.type) for column, field in zip(columns, self.schema)]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+# CSV 輸出：檔名以 .gz 結尾時以 gzip 壓縮，否則寫成未壓縮的 CSV
+class CsvSink:
+    def __init__(self, path):
+        if path.endswith(".gz"):
+            self.file = gzip.open(path, "wt", encoding="utf-8", newline="")
+        else:
+            self.file = open(path, "w", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+# 匯出進度依篩選條件分開記錄，帶關鍵字或日期範圍的匯出不會推進完整匯出的進度
+# 沒有篩選條件時直接以來源為鍵，與舊的進度檔相容
+def state_key(site, keyword=None, since=None, until=None):
+    if not (keyword or since or until):
+        return site
+    return "\t".join([site, keyword or "", since or "", until or ""])
+
+
+# 讀取 / 儲存上次匯出的進度：{state_key: {"last_id": ..., "last_date": ...}}
+def load_state(path=None):
+    path = path or config.EXPORT_STATE_FILE
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(state, path=None):
+    path = path or config.EXPORT_STATE_FILE
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+
+# 匯出資料；incremental 為 "id" 或 "date" 時從上次匯出的位置接續
+def export(output, fmt="parquet", sites=None, keyword=None, since=None, until=None,
+           incremental=None, chunk_size=CHUNK_SIZE, state_file=None):
+    sites = sites or list(SITE_QUERIES)
+    state = load_state(state_file) if incremental else {}
+
+    conn = connect_to_db()
+    if not conn:
+        return 0
+
+    sink = ParquetSink(output) if fmt == "parquet" else CsvSink(output)
+    total = 0
+    try:
+        for site in sites:
+            key = state_key(site, keyword, since, until)
+            site_state = state.get(key, {})
+            after_id = site_state.get("last_id") if incremental else None
+            # 從上次匯出的最後日期當天接續（不是隔天），當天稍後才寫入的資料列 id 較大，仍會匯出
+            after_date = site_state.get("last_date") if incremental == "date" else None
+
+            count = 0
+            for rows in iter_site_rows(conn, site, keyword, since, until, after_id, chunk_size, after_date):
+                sink.write(rows)
+                count += len(rows)
+                site_state["last_id"] = max(site_state.get("last_id") or 0, rows[-1][1])
+                last_date = max(str(row[3]) for row in rows)
+                site_state["last_date"] = max(site_state.get("last_date") or "", last_date)
+            state[key] = site_state
+            total += count
+            print(f"📦 {site}: 匯出 {count} 筆")
+    except pymysql.MySQLError as e:
+        print(f"❌ 匯出時發生錯誤: {e}")
+        return total
+    finally:
+        sink.close()
+        conn.close()
+
+    if incremental:
+        save_state(state, state_file)
+    print(f"✅ 匯出完成，共 {total} 筆 -> {output}")
+    return total
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m crawl export", description="分批匯出四個來源的資料為 Parquet 或 gzip CSV")
+    parser.add_argument("output", help="輸出檔路徑")
+    parser.add_argument("--format", choices=["parquet", "csv"], default=None, help="輸出格式（預設依副檔名判斷，.csv.gz 為 gzip CSV、.csv 為未壓縮 CSV）")
+    parser.add_argument("--site", action="append", choices=list(SITE_QUERIES), help="只匯出指定來源，可重複指定")
+    parser.add_argument("--keyword", help="只匯出指定的搜尋關鍵字")
+    parser.add_argument("--since", help="起始抓取日期 YYYY-MM-DD")
+    parser.add_argument("--until", help="結束抓取日期 YYYY-MM-DD")
+    parser.add_argument("--incremental", choices=["id", "date"], help="從上次匯出的 id 或日期之後接續匯出（進度依來源、--keyword、--since、--until 分開記錄）")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help=f"每批筆數（預設 {CHUNK_SIZE}）")
+    parser.add_argument("--state-file", default=None, help=f"匯出進度檔（預設 {config.EXPORT_STATE_FILE}）")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    fmt = args.format or ("csv" if args.output.endswith((".csv", ".csv.gz")) else "parquet")
+    export(args.output, fmt, args.site, args.keyword, args.since, args.until,
+           args.incremental, args.chunk_size, args.state_file)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n⏹️ 程式被中斷，結束執行。")
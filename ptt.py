@@ -1,38 +1,16 @@
 import requests
 from bs4 import BeautifulSoup
 import pymysql
-import os
-from dotenv import load_dotenv
-from google.cloud import language_v1
-from google.cloud.language_v1 import Document
 from datetime import date
-
-# 讀取環境變數
-load_dotenv()
-MYSQL_HOST = os.getenv('MARIADB_HOST')
-MYSQL_USER = os.getenv('MARIADB_USER')
-MYSQL_PASSWORD = os.getenv('MARIADB_PASSWORD')
-MYSQL_DB = os.getenv('MARIADB_DB')
+import archive
+import dedup
+import search
+from config import connect_to_db, load_keywords
+from sentiment import analyze_sentiment
 
 BASE_URL = "https://pttweb.tw/ALLPOST/*"  # 基本 URL
 MAX_ARTICLES = 10  # 每個關鍵字最多抓取 10 篇文章
 
-# 連接 MariaDB
-def connect_to_db():
-    try:
-        conn = pymysql.connect(
-            host=MYSQL_HOST,
-            user=MYSQL_USER,
-            password=MYSQL_PASSWORD,
-            database=MYSQL_DB,
-            charset="utf8mb4",
-            autocommit=True
-        )
-        return conn
-    except pymysql.MySQLError as e:
-        print(f"❌ MySQL 連線錯誤: {e}")
-        return None
-
 # 確保資料表存在，新增 site、search_keyword 與 capture_date 欄位
 def create_table():
     conn = connect_to_db()
@@ -58,32 +36,8 @@ def create_table():
         finally:
             conn.close()
 
-# 使用 Google Cloud Natural Language API 進行情感分析
-def analyze_sentiment(text):
-    if not text.strip():
-        return 0.0
-    
-    client = language_v1.LanguageServiceClient()
-    document = Document(content=text, type_=language_v1.Document.Type.PLAIN_TEXT)
-    
-    try:
-        sentiment = client.analyze_sentiment(request={'document': document}).document_sentiment
-        return round(sentiment.score, 6)
-    except Exception as e:
-        print(f"⚠️ Google NLP API 錯誤: {e}")
-        return 0.0
-
-# 讀取關鍵字
-def load_keywords(filename="keywords.txt"):
-    try:
-        with open(filename, "r", encoding="utf-8") as file:
-            return [line.strip() for line in file.readlines() if line.strip()]
-    except FileNotFoundError:
-        print(f"❌ 關鍵字檔案 {filename} 不存在")
-        return []
-
 # 抓取文章列表（加入 timeout 與例外處理）
-def fetch_article_links(keyword):
+def fetch_article_links(keyword, capture_date=None):
     search_url = f"{BASE_URL}{keyword}"
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
@@ -105,10 +59,33 @@ def fetch_article_links(keyword):
         title = link.select_one(".name").text.strip()
         url = f"https://pttweb.tw{link['href']}"
         articles.append({"title": title, "url": url})
+
+    archive.append_capture("ptt", "search", keyword, search_url, response.text, articles, capture_date=capture_date)
     return articles
 
+# 解析文章 HTML，取出標題、內文與留言（不連網，重新解析封存資料時也用這個）
+def extract_article(html):
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # 擷取標題
+    title_element = soup.select_one("div.article span.value h1")
+    title = title_element.text.strip() if title_element else "No Title"
+
+    # 擷取內文
+    content_element = soup.select_one("div.article")
+    content = content_element.text.strip() if content_element else "No Content"
+
+    # 擷取留言
+    comments = []
+    for push in soup.select("div.push span.f3.push-content"):
+        comment_text = push.text.strip()
+        if comment_text:
+            comments.append(comment_text)
+
+    return {"title": title, "content": content, "comments": comments}
+
 # 解析文章內容與留言（加入 timeout 與例外處理）
-def parse_article(article_url):
+def parse_article(article_url, keyword=None, capture_date=None):
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
     }
@@ -123,24 +100,15 @@ def parse_article(article_url):
         print(f"❌ 無法獲取文章，錯誤碼: {response.status_code}")
         return None
 
-    soup = BeautifulSoup(response.text, 'html.parser')
+    article = extract_article(response.text)
+    archive.append_capture("ptt", "article", keyword, article_url, response.text, article, capture_date=capture_date)
 
-    # 擷取標題
-    title_element = soup.select_one("div.article span.value h1")
-    title = title_element.text.strip() if title_element else "No Title"
-
-    # 擷取內文
-    content_element = soup.select_one("div.article")
-    content = content_element.text.strip() if content_element else "No Content"
-
-    # 擷取留言
     comments_data = []
-    for push in soup.select("div.push span.f3.push-content"):
-        comment_text = push.text.strip()
-        if comment_text:
-            sentiment_score = analyze_sentiment(comment_text)
-            comments_data.append({"comment": comment_text, "sentiment_score": sentiment_score})
+    for comment_text in article["comments"]:
+        scored = dedup.score_text(comment_text)
+        comments_data.append({"comment": comment_text, "sentiment_score": scored["score"], "dedup": scored})
 
+    title, content = article["title"], article["content"]
     print(f"📄 解析文章: {title[:30]} | 內文長度: {len(content)} | 留言數量: {len(comments_data)}")
     return {"title": title, "content": content, "comments": comments_data}
 
@@ -158,18 +126,77 @@ def save_to_db(title, content, comment, sentiment_score, site, search_keyword, c
             cur.execute(sql_query, (title, content, comment, sentiment_score, site, search_keyword, capture_date))
             conn.commit()
             print(f"✅ 成功儲存: {title[:30]}...")
+            return cur.lastrowid
         except pymysql.MySQLError as e:
             print(f"❌ MySQL 錯誤: {e}")
         finally:
             conn.close()
 
+# 重新處理一筆封存資料（供 rescore.py 使用，不會連線到 PTT）
+def rescore_capture(entry, reparse=False):
+    if entry["kind"] != "article":
+        return 0
+
+    article = extract_article(entry["raw"]) if reparse else entry["records"]
+    for comment_text in article["comments"]:
+        sentiment_score = analyze_sentiment(comment_text)
+        row_id = save_to_db(
+            article["title"],
+            article["content"],
+            comment_text,
+            sentiment_score,
+            "ptt",
+            entry["keyword"],
+            entry["capture_date"]
+        )
+        search.index_row("ptt", row_id, entry["keyword"], entry["capture_date"], None, article["title"], article["content"],
+                         comment_text, sentiment_score)
+    return len(article["comments"])
+
+# 處理單篇文章：解析、情感分析並儲存每則留言；無法取得文章時回傳 False
+def process_article(article, keyword, today):
+    print(f"📄 處理文章: {article['title']} | URL: {article['url']}")
+    article_data = parse_article(article["url"], keyword, today)
+    if not article_data:
+        return False
+    for comment_data in article_data["comments"]:
+        row_id = save_to_db(
+            article_data["title"],
+            article_data["content"],
+            comment_data["comment"],
+            comment_data["sentiment_score"],
+            "ptt",
+            keyword,
+            today
+        )
+        dedup.link(comment_data["dedup"], "ptt", "comment", row_id, today)
+        search.index_row("ptt", row_id, keyword, today, None, article_data["title"], article_data["content"],
+                         comment_data["comment"], comment_data["sentiment_score"])
+    return True
+
+# 供 scheduler.py 輪詢：只處理 seen 中沒有的文章，回傳 (新文章網址, 發出的請求數)，並把新網址加入 seen
+# 連線失敗的文章不加入 seen，下次輪詢會再試
+def poll(keyword, seen):
+    today = date.today().isoformat()
+    articles = fetch_article_links(keyword, today)
+    new_urls, requests_made = [], 1
+    for article in articles:
+        if article["url"] in seen:
+            continue
+        requests_made += 1
+        if not process_article(article, keyword, today):
+            continue
+        seen.add(article["url"])
+        new_urls.append(article["url"])
+    return new_urls, requests_made
+
 # 主程式
-def main():
+def main(keywords_file="keywords.txt"):
     create_table()
 
-    keywords = load_keywords()
+    keywords = load_keywords(keywords_file)
     if not keywords:
-        print("❌ 關鍵字清單為空，請檢查 keywords.txt")
+        print(f"❌ 關鍵字清單為空，請檢查 {keywords_file}")
         return
 
     # 取得今天日期，格式為 YYYY-MM-DD
@@ -177,21 +204,9 @@ def main():
 
     for keyword in keywords:
         print(f"🔍 處理關鍵字: {keyword}")
-        articles = fetch_article_links(keyword)
+        articles = fetch_article_links(keyword, today)
         for article in articles:
-            print(f"📄 處理文章: {article['title']} | URL: {article['url']}")
-            article_data = parse_article(article["url"])
-            if article_data:
-                for comment_data in article_data["comments"]:
-                    save_to_db(
-                        article_data["title"],
-                        article_data["content"],
-                        comment_data["comment"],
-                        comment_data["sentiment_score"],
-                        "ptt",
-                        keyword,
-                        today
-                    )
+            process_article(article, keyword, today)
 
     print("✅ 所有關鍵字處理完成")
 
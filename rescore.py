@@ -0,0 +1,143 @@
+import os
+import argparse
+import importlib
+from collections import defaultdict
+from multiprocessing import Pool
+import pymysql
+import archive
+import dedup
+import search
+from config import connect_to_db
+
+# 封存來源名稱 -> (爬蟲模組, 資料表, 會寫入資料列的封存種類)
+SITE_MODULES = {
+    "ptt": ("ptt", "ptt", "article"),
+    "yt": ("yt", "yt", "comments"),
+    "reddit": ("Reddit", "reddit", "post"),
+    "bahamut": ("bahamut", "bahamut", "article"),
+}
+CHUNK_SIZE = 200  # 每個工作單位處理的封存筆數
+
+
+# 依來源切出工作單位：(來源, 分段檔, 該段索引的一部分)
+def build_tasks(since=None, until=None, sites=None):
+    tasks = []
+    for segment_path in archive.list_segments(since, until, sites):
+        site = os.path.basename(segment_path).rsplit("-", 1)[0]
+        if site not in SITE_MODULES:
+            print(f"⚠️ 未知的來源 {site}，略過 {segment_path}")
+            continue
+        index_entries = archive.read_index(segment_path)
+        for start in range(0, len(index_entries), CHUNK_SIZE):
+            tasks.append((site, segment_path, index_entries[start:start + CHUNK_SIZE]))
+    return tasks
+
+
+# 子行程：解析（或直接沿用封存的解析結果）後重新情感分析並寫入資料庫
+# 這裡刻意不經過近似重複索引，每筆都重新呼叫情感分析，才能反映新的情感分析設定
+def process_task(args):
+    site, segment_path, index_entries, reparse = args
+    module = importlib.import_module(SITE_MODULES[site][0])
+    saved = 0
+    for entry in archive.read_captures(segment_path, index_entries):
+        try:
+            saved += module.rescore_capture(entry, reparse=reparse)
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"⚠️ 無法處理封存資料 {entry.get('url')}: {e}")
+    return saved
+
+
+# 找出封存資料能重建的 (來源, 搜尋關鍵字, 抓取日期)：索引中實際有會寫入資料列的封存資料
+def archived_keys(tasks):
+    keys = set()
+    for site, segment_path, index_entries in tasks:
+        row_kind = SITE_MODULES[site][2]
+        capture_date = os.path.basename(os.path.dirname(segment_path))
+        for item in index_entries:
+            if item["kind"] == row_kind:
+                keys.add((site, item["keyword"], capture_date))
+    return sorted(keys, key=lambda key: (key[0], key[1] or "", key[2]))
+
+
+# 在同一個交易中清除封存資料能重建的 (來源, 搜尋關鍵字, 抓取日期) 的舊資料列，避免重新處理後出現重複資料
+# 成功時回傳 {來源: [被刪除的資料列 id]}，失敗時回傳 None（已全部回復）
+def delete_existing_rows(keys):
+    conn = connect_to_db()
+    if not conn:
+        return None
+    deleted = defaultdict(list)
+    try:
+        conn.begin()
+        cur = conn.cursor()
+        for site, keyword, capture_date in keys:
+            table = SITE_MODULES[site][1]
+            where = "search_keyword <=> %s AND capture_date = %s"
+            cur.execute(f"SELECT id FROM {table} WHERE {where}", (keyword, capture_date))
+            deleted[site].extend(row[0] for row in cur.fetchall())
+            cur.execute(f"DELETE FROM {table} WHERE {where}", (keyword, capture_date))
+            print(f"🗑️ 已清除 {table} {capture_date} {keyword} 舊資料 {cur.rowcount} 筆")
+        conn.commit()
+        return deleted
+    except pymysql.MySQLError as e:
+        conn.rollback()
+        print(f"❌ 清除舊資料時發生錯誤: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def run(mode="rescore", sites=None, since=None, until=None, workers=None, replace=False):
+    sites = sites or list(SITE_MODULES)
+    reparse = mode == "reparse"
+
+    if replace and not (since and until):
+        print("❌ 使用 --replace 時必須同時指定 --since 與 --until")
+        return 0
+
+    tasks = build_tasks(since, until, sites)
+    if not tasks:
+        print("❌ 找不到符合條件的封存資料")
+        return 0
+
+    if replace:
+        # 只刪除封存資料涵蓋的 (來源, 關鍵字, 日期)，沒有封存的資料無法重建，不能刪
+        deleted = delete_existing_rows(archived_keys(tasks))
+        if deleted is None:
+            print("❌ 無法清除舊資料，停止重新處理以免產生重複資料")
+            return 0
+        # 被刪除的資料列同時從全文索引、近似重複索引與連結中移除
+        for site, row_ids in deleted.items():
+            search.delete_rows(site, row_ids)
+            dedup.forget_rows(site, row_ids)
+
+    print(f"🔄 {mode}: {len(tasks)} 個工作單位，使用 {workers or os.cpu_count()} 個行程")
+    total = 0
+    with Pool(processes=workers) as pool:
+        for saved in pool.imap_unordered(process_task, [task + (reparse,) for task in tasks]):
+            total += saved
+
+    print(f"✅ 重新處理完成，共寫入 {total} 筆")
+    return total
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m crawl rescore", description="從封存資料重新解析 / 重新情感分析並寫入資料庫（不連線到來源網站）")
+    parser.add_argument("mode", choices=["rescore", "reparse"], help="rescore: 沿用封存的解析結果；reparse: 從原始頁面重新解析")
+    parser.add_argument("--site", action="append", choices=list(SITE_MODULES), help="只處理指定來源，可重複指定")
+    parser.add_argument("--since", help="起始抓取日期 YYYY-MM-DD")
+    parser.add_argument("--until", help="結束抓取日期 YYYY-MM-DD")
+    parser.add_argument("--workers", type=int, default=None, help="行程數，預設為 CPU 核心數")
+    parser.add_argument("--replace", action="store_true", help="先刪除封存資料涵蓋的 (關鍵字, 日期) 的舊資料列（需同時指定 --since 與 --until）")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    run(args.mode, args.site, args.since, args.until, args.workers, args.replace)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n⏹️ 程式被中斷，結束執行。")
@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import heapq
+import argparse
+import importlib
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+import archive
+import dedup
+import config
+from config import load_keywords
+
+# 常駐排程：以優先佇列輪流輪詢 (來源, 關鍵字)，依每個關鍵字過去的新內容產生速度決定輪詢頻率，
+# 熱門關鍵字經常輪詢、冷門關鍵字很少輪詢，並受請求預算與截止時間限制
+# 成本以各來源 poll() 回傳的單位計：網頁爬蟲為請求數，YouTube 為 API 配額單位（search.list 一次 100）；
+# 兩者單位不同，總預算只計網頁爬蟲的請求數，YouTube 配額另以 --site-budget yt=N 限制
+
+# 來源 -> (爬蟲模組, 預設關鍵字檔, 建立資料表的函式)
+SOURCES = {
+    "ptt": ("ptt", "keywords.txt", "create_table"),
+    "yt": ("yt", "keywords_yt.txt", "create_tables_if_not_exist"),
+    "reddit": ("Reddit", "keywords.txt", "create_table"),
+    "bahamut": ("bahamut", "keywords.txt", "create_bahamut_table_if_not_exist"),
+}
+# 封存資料中代表「一篇內容」的種類，網址（YouTube 為影片 id）與各來源 poll() 使用的 id 相同
+ITEM_KINDS = {"ptt": "article", "yt": "comments", "reddit": "post", "bahamut": "article"}
+
+MIN_INTERVAL = 15 * 60        # 最短輪詢間隔（秒）
+MAX_INTERVAL = 24 * 60 * 60   # 最長輪詢間隔（秒）
+DEFAULT_INTERVAL = 2 * 60 * 60  # 還沒有速度資料時的間隔
+TARGET_NEW_ITEMS = 3          # 希望每次輪詢平均抓到的新內容數
+RATE_ALPHA = 0.3              # 新內容速度的指數移動平均權重
+SITE_GAP = 30                 # 同一來源兩次輪詢之間至少間隔（秒），避免被封鎖
+DEFAULT_COST = 5              # 還沒有資料時，預估一次輪詢的請求數
+DEFAULT_COSTS = {"yt": 103}   # 個別來源的預估：YouTube 一次搜尋 100 單位加上每支影片的留言 1 單位
+QUOTA_SITES = {"yt"}          # 成本以 API 配額計的來源，不計入總請求預算
+SEEN_LIMIT = 1000             # 每個關鍵字記住的已處理內容數
+
+
+# 依新內容速度（篇/小時）決定下次輪詢間隔
+def interval_for(rate):
+    if rate is None:
+        return DEFAULT_INTERVAL
+    if rate <= 0:
+        return MAX_INTERVAL
+    return min(MAX_INTERVAL, max(MIN_INTERVAL, TARGET_NEW_ITEMS / rate * 3600))
+
+
+def state_key(site, keyword):
+    return f"{site}\t{keyword}"
+
+
+# 讀取 / 儲存排程狀態：{"來源\t關鍵字": {"rate", "last_poll", "cost", "seen"}}
+def load_state(path=None):
+    path = path or config.SCHEDULER_STATE_FILE
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(state, path=None):
+    path = path or config.SCHEDULER_STATE_FILE
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# 從封存索引推估過去每天執行時各關鍵字的新內容速度，並記下已處理過的內容
+def seed_from_archive(state, sites, days=14):
+    since = (date.today() - timedelta(days=days)).isoformat()
+    history = defaultdict(dict)  # (來源, 關鍵字) -> {內容 id: 第一次抓到的日期}
+    for segment_path in archive.list_segments(since=since, sites=sites):
+        site = os.path.basename(segment_path).rsplit("-", 1)[0]
+        capture_date = os.path.basename(os.path.dirname(segment_path))
+        for item in archive.read_index(segment_path):
+            if item["kind"] == ITEM_KINDS.get(site) and item["url"]:
+                history[(site, item["keyword"])].setdefault(item["url"], capture_date)
+
+    seeded = 0
+    for (site, keyword), items in history.items():
+        entry = state.setdefault(state_key(site, keyword), {})
+        if entry.get("last_poll"):
+            continue
+        dates = sorted(items.values())
+        first, last = date.fromisoformat(dates[0]), date.fromisoformat(dates[-1])
+        hours = ((last - first).days + 1) * 24
+        entry["rate"] = len(items) / hours
+        entry["last_poll"] = min(time.time(), datetime.combine(last + timedelta(days=1), datetime.min.time()).timestamp())
+        entry["seen"] = list(items)[-SEEN_LIMIT:]
+        seeded += 1
+    print(f"📚 從封存資料推估 {seeded} 個關鍵字的新內容速度")
+
+
+# 一次輪詢後更新速度、成本與已處理內容
+def update_entry(entry, new_ids, cost, now):
+    if entry.get("last_poll"):
+        hours = max((now - entry["last_poll"]) / 3600, 1 / 60)
+        observed = len(new_ids) / hours
+        entry["rate"] = observed if entry.get("rate") is None else RATE_ALPHA * observed + (1 - RATE_ALPHA) * entry["rate"]
+    # 第一次輪詢時所有內容都算「新」，無法代表速度，只記下已處理內容
+    entry["cost"] = cost if entry.get("cost") is None else RATE_ALPHA * cost + (1 - RATE_ALPHA) * entry["cost"]
+    entry["last_poll"] = now
+    entry["seen"] = (entry.get("seen", []) + new_ids)[-SEEN_LIMIT:]
+
+
+# 解析截止時間：HH:MM（今天，已過則為明天）或 ISO 日期時間
+def parse_deadline(text):
+    if not text:
+        return None
+    try:
+        hour, minute = map(int, text.split(":"))
+        deadline = datetime.now().replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if deadline <= datetime.now():
+            deadline += timedelta(days=1)
+    except ValueError:
+        deadline = datetime.fromisoformat(text)
+    return deadline.timestamp()
+
+
+def run(sites=None, budget=None, site_budgets=None, deadline=None, seed_days=14, state_file=None):
+    sites = sites or list(SOURCES)
+    site_budgets = site_budgets or {}
+    state = load_state(state_file)
+    if seed_days:
+        seed_from_archive(state, sites, seed_days)
+
+    now = time.time()
+    queue = []
+    for site in sites:
+        _, keywords_file, _ = SOURCES[site]
+        for keyword in load_keywords(keywords_file):
+            entry = state.setdefault(state_key(site, keyword), {})
+            due = entry["last_poll"] + interval_for(entry.get("rate")) if entry.get("last_poll") else now
+            heapq.heappush(queue, (due, site, keyword))
+    if not queue:
+        print("❌ 沒有可輪詢的關鍵字")
+        return
+
+    modules = {}
+    spent, site_spent, last_site_poll = 0, defaultdict(int), {}
+    print(f"🗓️ 開始排程：{len(queue)} 個 (來源, 關鍵字)，請求預算 {'無上限' if budget is None else budget}，"
+          f"截止 {datetime.fromtimestamp(deadline).isoformat(timespec='minutes') if deadline else '無'}")
+
+    while queue:
+        due, site, keyword = heapq.heappop(queue)
+        earliest = last_site_poll.get(site, 0) + SITE_GAP
+        if due < earliest:
+            heapq.heappush(queue, (earliest, site, keyword))
+            continue
+        if deadline and due > deadline:
+            print("⏰ 已到截止時間")
+            break
+
+        entry = state[state_key(site, keyword)]
+        estimate = entry.get("cost") or DEFAULT_COSTS.get(site, DEFAULT_COST)
+        if site not in QUOTA_SITES and budget is not None and spent + estimate > budget:
+            print(f"💸 總預算不足，不再輪詢 {site} / {keyword}")
+            continue
+        if site in site_budgets and site_spent[site] + estimate > site_budgets[site]:
+            print(f"💸 {site} 預算不足，不再輪詢 {site} / {keyword}")
+            continue
+
+        wait = due - time.time()
+        if wait > 0:
+            time.sleep(wait)
+
+        if site not in modules:
+            module_name, _, setup_name = SOURCES[site]
+            modules[site] = importlib.import_module(module_name)
+            getattr(modules[site], setup_name)()
+
+        print(f"🔁 輪詢 {site} / {keyword}")
+        seen = set(entry.get("seen", []))
+        try:
+            new_ids, cost = modules[site].poll(keyword, seen)
+        except Exception as e:
+            print(f"❌ 輪詢 {site} / {keyword} 失敗: {e}")
+            new_ids, cost = [], estimate
+
+        now = time.time()
+        last_site_poll[site] = now
+        if site not in QUOTA_SITES:
+            spent += cost
+        site_spent[site] += cost
+        update_entry(entry, new_ids, cost, now)
+        interval = interval_for(entry.get("rate"))
+        heapq.heappush(queue, (now + interval, site, keyword))
+
+        save_state(state, state_file)
+        dedup.save_index()
+        rate = entry.get("rate")
+        print(f"✅ {site} / {keyword}: 新內容 {len(new_ids)} 篇，成本 {cost}，"
+              f"速度 {f'{rate:.2f} 篇/小時' if rate is not None else '未知'}，{interval / 60:.0f} 分鐘後再輪詢（{site} 累計成本 {site_spent[site]}，累計請求 {spent}）")
+
+    save_state(state, state_file)
+    print("✅ 排程結束")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m crawl daemon", description="常駐輪詢：依關鍵字熱度調整輪詢頻率")
+    parser.add_argument("--site", action="append", choices=list(SOURCES), help="只輪詢指定來源，可重複指定")
+    parser.add_argument("--budget", type=int, help="ptt / reddit / bahamut 的總請求數上限（不含 YouTube，YouTube 配額請用 --site-budget yt=N）")
+    parser.add_argument("--site-budget", action="append", default=[], metavar="SITE=N", help="單一來源成本上限，例如 yt=5000（YouTube 以 API 配額單位計，一次搜尋 100 單位）")
+    parser.add_argument("--deadline", help="截止時間，HH:MM 或 ISO 日期時間")
+    parser.add_argument("--seed-days", type=int, default=14, help="從最近幾天的封存資料推估速度（0 表示不推估）")
+    parser.add_argument("--state-file", default=None, help=f"排程狀態檔（預設 {config.SCHEDULER_STATE_FILE}）")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    site_budgets = {}
+    for item in args.site_budget:
+        site, _, value = item.partition("=")
+        if site not in SOURCES or not value.isdigit():
+            parser.error(f"無效的 --site-budget: {item}")
+        site_budgets[site] = int(value)
+
+    run(args.site, args.budget, site_budgets, parse_deadline(args.deadline), args.seed_days, args.state_file)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n⏹️ 程式被中斷，結束執行。")
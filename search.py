@@ -0,0 +1,305 @@
+import re
+import time
+import sqlite3
+import hashlib
+import argparse
+import unicodedata
+import config
+
+# 全文檢索：在本機 SQLite FTS5 維護一份倒排索引，涵蓋四個來源的標題、內文與留言
+# 中日文沒有空白斷詞，因此寫入前先把文字切成相鄰兩字（bigram）的詞元，英數字則以整個單字為詞元；
+# 查詢時用同樣方式切詞並組成片語查詢，等同於子字串比對，不需要 LIKE '%...%' 全表掃描
+#
+# 同一篇文章在資料庫中會隨每則留言重複存一次內文，因此文章（標題 + 內文）只索引一次，
+# 留言另外索引，並記錄屬於哪一篇文章
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    site TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    first_row_id INTEGER NOT NULL,
+    title TEXT,
+    url TEXT,
+    search_keyword TEXT,
+    capture_date TEXT,
+    content_sentiment_score REAL,
+    comment_count INTEGER NOT NULL DEFAULT 0,
+    comment_sentiment_sum REAL NOT NULL DEFAULT 0,
+    UNIQUE (site, digest)
+);
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER PRIMARY KEY,
+    site TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    article_id INTEGER NOT NULL,
+    comment TEXT,
+    sentiment_score REAL,
+    capture_date TEXT,
+    UNIQUE (site, row_id)
+);
+CREATE INDEX IF NOT EXISTS comments_article ON comments (article_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(title, content, tokenize='unicode61');
+CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5(comment, tokenize='unicode61');
+"""
+
+SCHEMA_VERSION = 2  # 切詞方式改變時遞增，舊索引會清空後重建
+TITLE_WEIGHT = 3.0  # 標題命中的權重高於內文
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[^\W_a-z0-9]+")
+
+_conn = None
+
+
+def _runs(text):
+    if not text:
+        return []
+    return _TOKEN_RE.findall(unicodedata.normalize("NFKC", text).lower())
+
+
+# 切詞：英數字整個單字一個詞元，其他文字（中日文等）切成相鄰兩字
+def tokenize(text):
+    tokens = []
+    for run in _runs(text):
+        if run.isascii() or len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+# 寫入索引的文字：雙字詞元之後再附上多字詞段中出現過的單字，
+# 單一字的查詢才找得到位在詞段結尾的字（例如「很好」的「好」）；單字放在最後，不影響雙字詞元的相鄰關係
+def _index_text(text):
+    unigrams = dict.fromkeys(ch for run in _runs(text) if not run.isascii() and len(run) > 1 for ch in run)
+    return " ".join(tokenize(text) + list(unigrams))
+
+
+# 將使用者查詢轉成 FTS5 查詢：每個以空白分隔的詞都必須出現（AND），詞內的詞元必須相鄰（片語）
+def build_match(query):
+    clauses = []
+    for term in query.split():
+        tokens = tokenize(term)
+        if not tokens:
+            continue
+        clauses.append('"' + " ".join(tokens) + '"')
+    return " AND ".join(clauses)
+
+
+# 取得索引資料庫連線（第一次使用時建立資料表）
+def get_connection():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(config.SEARCH_INDEX_FILE, timeout=30)
+        _conn.execute("PRAGMA journal_mode=WAL")  # 多個爬蟲同時寫入時不會互相阻擋讀取
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        version = _conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            exists = _conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'articles'").fetchone()
+            with _conn:
+                for table in ("articles", "comments", "articles_fts", "comments_fts"):
+                    _conn.execute(f"DROP TABLE IF EXISTS {table}")
+                _conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            if exists:
+                print("⚠️ 全文索引格式已更新，舊索引已清空，請執行 python -m crawl search rebuild 重建")
+        _conn.executescript(SCHEMA)
+    return _conn
+
+
+def close():
+    global _conn
+    if _conn is not None:
+        _conn.close()
+        _conn = None
+
+
+def _add_row(conn, site, row_id, search_keyword, capture_date, url, title, content, comment,
+             sentiment_score, content_sentiment_score=None):
+    capture_date = str(capture_date) if capture_date else None
+    digest = hashlib.sha1("\x00".join([url or "", title or "", content or ""]).encode("utf-8")).hexdigest()
+
+    # 多個行程可能同時索引同一篇文章，先 INSERT OR IGNORE 再查 id，不會因 UNIQUE 衝突而丟掉留言
+    cur = conn.execute("""
+        INSERT OR IGNORE INTO articles (site, digest, first_row_id, title, url, search_keyword, capture_date, content_sentiment_score)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (site, digest, row_id, title, url, search_keyword, capture_date, content_sentiment_score))
+    if cur.rowcount:
+        article_id = cur.lastrowid
+        conn.execute("INSERT INTO articles_fts (rowid, title, content) VALUES (?, ?, ?)",
+                     (article_id, _index_text(title), _index_text(content)))
+    else:
+        article_id = conn.execute("SELECT id FROM articles WHERE site = ? AND digest = ?", (site, digest)).fetchone()[0]
+
+    if not comment:
+        return
+    cur = conn.execute("""
+        INSERT OR IGNORE INTO comments (site, row_id, article_id, comment, sentiment_score, capture_date)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (site, row_id, article_id, comment, sentiment_score, capture_date))
+    if cur.rowcount:
+        conn.execute("INSERT INTO comments_fts (rowid, comment) VALUES (?, ?)", (cur.lastrowid, _index_text(comment)))
+        conn.execute("""
+            UPDATE articles SET comment_count = comment_count + 1, comment_sentiment_sum = comment_sentiment_sum + ?
+            WHERE id = ?
+        """, (sentiment_score or 0.0, article_id))
+
+
+# 資料列寫入資料庫後呼叫，欄位順序與 export.COLUMNS 相同
+def index_row(site, row_id, search_keyword, capture_date, url, title, content, comment,
+              sentiment_score, content_sentiment_score=None):
+    if not row_id:
+        return
+    try:
+        conn = get_connection()
+        with conn:
+            _add_row(conn, site, row_id, search_keyword, capture_date, url, title, content, comment,
+                     sentiment_score, content_sentiment_score)
+    except sqlite3.Error as e:
+        print(f"⚠️ 更新全文索引失敗: {e}")
+
+
+# 查詢：回傳依相關度排序的結果，文章命中與留言命中各自一筆
+def search(query, sites=None, since=None, until=None, limit=20):
+    match = build_match(query)
+    if not match:
+        return []
+
+    # 文章以第一次抓到的日期、留言以各自的抓取日期篩選
+    def build_filters(alias):
+        filters, params = "", []
+        if sites:
+            filters += f" AND {alias}.site IN ({', '.join('?' * len(sites))})"
+            params.extend(sites)
+        if since:
+            filters += f" AND {alias}.capture_date >= ?"
+            params.append(since)
+        if until:
+            filters += f" AND {alias}.capture_date <= ?"
+            params.append(until)
+        return filters, params
+
+    article_filters, article_params = build_filters("a")
+    comment_filters, comment_params = build_filters("c")
+
+    sql_query = f"""
+        SELECT 'article' AS kind, a.site, a.first_row_id, a.title, NULL, a.url, a.search_keyword, a.capture_date,
+               COALESCE(a.content_sentiment_score, a.comment_sentiment_sum / NULLIF(a.comment_count, 0)) AS sentiment,
+               bm25(articles_fts, {TITLE_WEIGHT}, 1.0) AS rank
+        FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid
+        WHERE articles_fts MATCH ?{article_filters}
+        UNION ALL
+        SELECT 'comment' AS kind, a.site, c.row_id, a.title, c.comment, a.url, a.search_keyword, c.capture_date,
+               c.sentiment_score AS sentiment,
+               bm25(comments_fts) AS rank
+        FROM comments_fts JOIN comments c ON c.id = comments_fts.rowid JOIN articles a ON a.id = c.article_id
+        WHERE comments_fts MATCH ?{comment_filters}
+        ORDER BY rank
+        LIMIT ?
+    """
+    cur = get_connection().execute(sql_query, [match] + article_params + [match] + comment_params + [limit])
+    keys = ["kind", "site", "row_id", "title", "comment", "url", "search_keyword", "capture_date", "sentiment_score", "rank"]
+    return [dict(zip(keys, row)) for row in cur.fetchall()]
+
+
+# 刪除指定資料列的留言與文章（rescore --replace 清除資料庫舊資料列後呼叫）
+def delete_rows(site, row_ids):
+    row_ids = sorted(set(row_ids))
+    conn = get_connection()
+    try:
+        with conn:
+            touched = set()
+            for start in range(0, len(row_ids), 500):
+                chunk = row_ids[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                cur = conn.execute(f"SELECT DISTINCT article_id FROM comments WHERE site = ? AND row_id IN ({placeholders})",
+                                   [site, *chunk])
+                touched.update(row[0] for row in cur)
+                cur = conn.execute(f"SELECT id FROM articles WHERE site = ? AND first_row_id IN ({placeholders})", [site, *chunk])
+                touched.update(row[0] for row in cur)
+                conn.execute(f"""
+                    DELETE FROM comments_fts WHERE rowid IN (SELECT id FROM comments WHERE site = ? AND row_id IN ({placeholders}))
+                """, [site, *chunk])
+                conn.execute(f"DELETE FROM comments WHERE site = ? AND row_id IN ({placeholders})", [site, *chunk])
+            # 沒有剩下留言的文章一併刪除
+            orphans = [
+                (article_id,) for article_id in touched
+                if not conn.execute("SELECT 1 FROM comments WHERE article_id = ? LIMIT 1", (article_id,)).fetchone()
+            ]
+            conn.executemany("DELETE FROM articles_fts WHERE rowid = ?", orphans)
+            conn.executemany("DELETE FROM articles WHERE id = ?", orphans)
+            # 留下來的文章（包括較早抓到的）依剩下的留言重新計算留言數與分數總和，重新索引時才不會重複累加
+            conn.executemany("""
+                UPDATE articles SET
+                    comment_count = (SELECT COUNT(*) FROM comments c WHERE c.article_id = articles.id),
+                    comment_sentiment_sum = (SELECT COALESCE(SUM(c.sentiment_score), 0) FROM comments c WHERE c.article_id = articles.id)
+                WHERE id = ?
+            """, [(article_id,) for article_id in touched])
+    except sqlite3.Error as e:
+        print(f"⚠️ 清除全文索引失敗: {e}")
+    finally:
+        close()  # 之後會 fork 子行程，不要把連線帶過去
+
+
+# 從資料庫重建（或補齊）全文索引
+def rebuild(sites=None, since=None, until=None):
+    import export
+    from config import connect_to_db
+
+    db = connect_to_db()
+    if not db:
+        return 0
+
+    conn = get_connection()
+    total = 0
+    try:
+        for site in sites or list(export.SITE_QUERIES):
+            for rows in export.iter_site_rows(db, site, since=since, until=until):
+                with conn:
+                    for row in rows:
+                        _add_row(conn, *row)
+                total += len(rows)
+                print(f"🔎 {site}: 已索引 {total} 筆")
+    finally:
+        db.close()
+    print(f"✅ 全文索引重建完成，共 {total} 筆")
+    return total
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m crawl search", description="全文檢索四個來源的標題、內文與留言")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    query_parser = subparsers.add_parser("query", help="查詢")
+    query_parser.add_argument("query", help="查詢字串，以空白分隔的詞都必須出現")
+    query_parser.add_argument("--site", action="append", choices=["ptt", "yt", "reddit", "bahamut"], help="只查詢指定來源")
+    query_parser.add_argument("--since", help="起始抓取日期 YYYY-MM-DD")
+    query_parser.add_argument("--until", help="結束抓取日期 YYYY-MM-DD")
+    query_parser.add_argument("--limit", type=int, default=20)
+
+    rebuild_parser = subparsers.add_parser("rebuild", help="從資料庫重建索引（已索引的資料列會略過）")
+    rebuild_parser.add_argument("--site", action="append", choices=["ptt", "yt", "reddit", "bahamut"])
+    rebuild_parser.add_argument("--since", help="起始抓取日期 YYYY-MM-DD")
+    rebuild_parser.add_argument("--until", help="結束抓取日期 YYYY-MM-DD")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.action == "rebuild":
+        rebuild(args.site, args.since, args.until)
+        return
+
+    t = time.perf_counter()
+    hits = search(args.query, args.site, args.since, args.until, args.limit)
+    elapsed = (time.perf_counter() - t) * 1000
+    for hit in hits:
+        score = f"{hit['sentiment_score']:+.3f}" if hit["sentiment_score"] is not None else "  -   "
+        text = hit["comment"] if hit["kind"] == "comment" else hit["title"]
+        print(f"[{hit['site']}#{hit['row_id']}] {hit['capture_date']} 情感 {score} {hit['kind']}: {(text or '')[:60]}")
+    print(f"🔎 共 {len(hits)} 筆，耗時 {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n⏹️ 程式被中斷，結束執行。")
@@ -0,0 +1,26 @@
+# Google Cloud Natural Language API 情感分析
+# google.cloud.language_v1 載入很慢且需要憑證，因此延遲到第一次分析時才匯入並建立客戶端
+_client = None
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        from google.cloud import language_v1
+        _client = language_v1.LanguageServiceClient()
+    return _client
+
+
+# 使用 Google Cloud Natural Language API 進行情感分析
+def analyze_sentiment(text):
+    if not text.strip():
+        return 0.0
+
+    from google.cloud import language_v1
+    document = language_v1.Document(content=text, type_=language_v1.Document.Type.PLAIN_TEXT)
+    try:
+        sentiment = _get_client().analyze_sentiment(request={'document': document}).document_sentiment
+        return round(sentiment.score, 6)
+    except Exception as e:
+        print(f"⚠️ Google NLP API 錯誤: {e}")
+        return 0.0
@@ -1,57 +1,37 @@
 import pymysql
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from google.cloud import language_v1
-from google.cloud.language_v1 import Document
-import os
 import time
 import random
-from dotenv import load_dotenv
 from datetime import datetime, date
-
-# 讀取 .env 設定檔
-load_dotenv()
-
-# 從環境變數中獲取 API 密鑰與資料庫設定
-API_KEY = os.getenv('YOUTUBE_API_KEY')
-MYSQL_HOST = os.getenv('MARIADB_HOST')
-MYSQL_USER = os.getenv('MARIADB_USER')
-MYSQL_PASSWORD = os.getenv('MARIADB_PASSWORD')
-MYSQL_DB = os.getenv('MARIADB_DB')
+import archive
+import dedup
+import search
+import config
+from config import connect_to_db, load_keywords
+from sentiment import analyze_sentiment
+
+# YouTube Data API 每次呼叫消耗的配額單位
+SEARCH_QUOTA = 100
+COMMENT_THREADS_QUOTA = 1
+
+_youtube = None
+
+# 建立 YouTube Data API 客戶端（googleapiclient 載入較慢，第一次使用時才匯入，之後重複使用）
+def get_youtube():
+    global _youtube
+    if _youtube is None:
+        from googleapiclient.discovery import build
+        _youtube = build('youtube', 'v3', developerKey=config.YOUTUBE_API_KEY)
+    return _youtube
+
+# 影片網址（與 export 匯出的 url 欄位相同）
+def video_url(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}"
 
 # 轉換 ISO 8601 格式為 MySQL 可用的 DATETIME 格式
 def convert_to_mysql_datetime(iso_datetime):
     dt = datetime.strptime(iso_datetime.replace('Z', ''), '%Y-%m-%dT%H:%M:%S')
     return dt.strftime('%Y-%m-%d %H:%M:%S')
 
-# 使用 Google Cloud Natural Language API 進行情感分析
-def analyze_sentiment(text):
-    if not text.strip():
-        return 0.0
-    client = language_v1.LanguageServiceClient()
-    document = Document(content=text, type_=language_v1.Document.Type.PLAIN_TEXT)
-    try:
-        sentiment = client.analyze_sentiment(request={'document': document}).document_sentiment
-        return round(sentiment.score, 6)
-    except Exception as e:
-        print(f"⚠️ Google NLP API 錯誤: {e}")
-        return 0.0
-
-# 建立 MySQL 連接
-def connect_to_db():
-    try:
-        conn = pymysql.connect(
-            host=MYSQL_HOST,
-            user=MYSQL_USER,
-            password=MYSQL_PASSWORD,
-            database=MYSQL_DB,
-            charset="utf8mb4"
-        )
-        return conn
-    except pymysql.MySQLError as e:
-        print(f"MySQL 連線錯誤: {e}")
-        return None
-
 # 檢查資料表是否存在，不存在則創建
 def create_tables_if_not_exist():
     conn = connect_to_db()
@@ -80,7 +60,7 @@ def create_tables_if_not_exist():
             conn.close()
 
 # **單條留言即時存入資料庫**
-def save_to_db(video_id, title, sentiment_score, comment, site, search_keyword, capture_date):
+def save_to_db(video_id, title, sentiment_score, comment, site, search_keyword, capture_date, pause=True):
     conn = connect_to_db()
     if conn:
         try:
@@ -108,66 +88,92 @@ def save_to_db(video_id, title, sentiment_score, comment, site, search_keyword,
             print(f"✅ 成功存入留言：{comment['content'][:30]}... (影片: {title[:30]})")
 
             # 隨機延遲避免 API 過載
-            time.sleep(random.uniform(1, 2))
+            if pause:
+                time.sleep(random.uniform(1, 2))
+
+            return cur.lastrowid
 
         except pymysql.MySQLError as e:
             print(f"❌ 資料儲存時發生錯誤: {e}")
         finally:
             conn.close()
 
-def youtube_scraper():
-    youtube = build('youtube', 'v3', developerKey=API_KEY)
+# 處理單支影片：取得留言、情感分析並逐條存入資料庫；API 呼叫失敗時回傳 False
+def process_video(video, query, today):
+    print(f"📄 正在爬取影片: {video['title']} ({video['video_id']})")
+
+    # 取得留言
+    comments = get_all_comments(video['video_id'], keyword=query, title=video['title'], capture_date=today)
+    time.sleep(random.uniform(2, 5))
+
+    if not comments:
+        print(f"⚠️ 無法獲取評論，影片 ID：{video['video_id']}，標題：{video['title']}")
+        return comments is not None
+
+    # 計算影片的平均情感分數
+    video_sentiment_score = sum([c['sentiment_score'] for c in comments]) / len(comments)
+
+    # **即時存入每條留言**
+    for comment in comments:
+        row_id = save_to_db(
+            video_id=video['video_id'],
+            title=video['title'],
+            sentiment_score=video_sentiment_score,  # 影片的總體情感分數
+            comment=comment,
+            site="youtube",
+            search_keyword=query,
+            capture_date=today
+        )
+        dedup.link(comment['dedup'], "yt", "comment", row_id, today)
+        search.index_row("yt", row_id, query, today, video_url(video['video_id']), video['title'], None,
+                         comment['content'], comment['sentiment_score'], video_sentiment_score)
+
+    time.sleep(random.uniform(1, 3))
+    return True
+
+# 供 scheduler.py 輪詢：只處理 seen 中沒有的影片，回傳 (新影片 id, 消耗的 API 配額單位)，並把新 id 加入 seen
+# search.list 每次 100 單位、commentThreads.list 每次 1 單位，預算以配額計才不會超過每日配額
+# 取得留言失敗的影片不加入 seen，下次輪詢會再試
+def poll(keyword, seen):
+    today = date.today().isoformat()
+    videos = search_videos(keyword, capture_date=today)
+    new_ids, quota = [], SEARCH_QUOTA
+    for video in videos:
+        if video['video_id'] in seen:
+            continue
+        quota += COMMENT_THREADS_QUOTA
+        if not process_video(video, keyword, today):
+            continue
+        seen.add(video['video_id'])
+        new_ids.append(video['video_id'])
+    return new_ids, quota
+
+def youtube_scraper(keywords_file="keywords_yt.txt"):
     create_tables_if_not_exist()
 
     # 取得今天的日期
     today = date.today().isoformat()
 
     # 讀取關鍵字
-    with open('keywords_yt.txt', 'r') as file:
-        keywords = file.readlines()
+    keywords = load_keywords(keywords_file)
 
     for query in keywords:
-        query = query.strip()
         print(f"🔍 正在搜尋關鍵字: {query}")
 
         # 取得影片
-        videos = search_videos(query)
+        videos = search_videos(query, capture_date=today)
         time.sleep(random.uniform(3, 6))
 
         for video in videos:
-            print(f"📄 正在爬取影片: {video['title']} ({video['video_id']})")
-
-            # 取得留言
-            comments = get_all_comments(video['video_id'])
-            time.sleep(random.uniform(2, 5))
-
-            if not comments:
-                print(f"⚠️ 無法獲取評論，影片 ID：{video['video_id']}，標題：{video['title']}")
-                continue
-
-            # 計算影片的平均情感分數
-            video_sentiment_score = sum([c['sentiment_score'] for c in comments]) / len(comments)
-
-            # **即時存入每條留言**
-            for comment in comments:
-                save_to_db(
-                    video_id=video['video_id'],
-                    title=video['title'],
-                    sentiment_score=video_sentiment_score,  # 影片的總體情感分數
-                    comment=comment,
-                    site="youtube",
-                    search_keyword=query,
-                    capture_date=today
-                )
-
-            time.sleep(random.uniform(1, 3))
+            process_video(video, query, today)
 
     print("✅ 所有資料已成功保存至資料庫")
 
-def search_videos(keyword, max_results=3):
-    youtube = build('youtube', 'v3', developerKey=API_KEY)
+def search_videos(keyword, max_results=3, capture_date=None):
+    from googleapiclient.errors import HttpError
+
     try:
-        search_response = youtube.search().list(
+        search_response = get_youtube().search().list(
             q=keyword,
             part='snippet',
             type='video',
@@ -177,30 +183,69 @@ def search_videos(keyword, max_results=3):
             regionCode='TW'
         ).execute()
 
-        return [{
+        videos = [{
             'video_id': item['id']['videoId'],
             'title': item['snippet'].get('title', 'No Title')
         } for item in search_response['items']]
+        archive.append_capture("yt", "search", keyword, None, search_response, videos, capture_date=capture_date)
+        return videos
 
     except HttpError as e:
         print(f"搜尋失敗，錯誤訊息：{e}")
         return []
 
-def get_all_comments(video_id, max_comments=50):
-    youtube = build('youtube', 'v3', developerKey=API_KEY)
+# 從 commentThreads API 回應取出留言文字（不連網，重新解析封存資料時也用這個）
+def extract_comments(response):
+    return [item['snippet']['topLevelComment']['snippet'].get('textOriginal', '') for item in response.get('items', [])]
+
+# 取得影片留言；API 呼叫失敗時回傳 None
+def get_all_comments(video_id, max_comments=50, keyword=None, title=None, capture_date=None):
+    from googleapiclient.errors import HttpError
+
     comments = []
     try:
-        request = youtube.commentThreads().list(part="snippet", videoId=video_id, maxResults=max_comments)
+        request = get_youtube().commentThreads().list(part="snippet", videoId=video_id, maxResults=max_comments)
         response = request.execute()
-        for item in response.get('items', []):
-            text = item['snippet']['topLevelComment']['snippet'].get('textOriginal', '')
-            comments.append({'content': text, 'sentiment_score': analyze_sentiment(text)})
+        texts = extract_comments(response)
+        archive.append_capture("yt", "comments", keyword, video_id, response, texts, meta={"video_id": video_id, "title": title},
+                               capture_date=capture_date)
+        for text in texts:
+            scored = dedup.score_text(text)
+            comments.append({'content': text, 'sentiment_score': scored['score'], 'dedup': scored})
     except HttpError:
-        pass
+        return None
     return comments
 
-def main():
-    youtube_scraper()
+# 重新處理一筆封存資料（供 rescore.py 使用，只呼叫情感分析，不會呼叫 YouTube API）
+def rescore_capture(entry, reparse=False):
+    if entry["kind"] != "comments":
+        return 0
+
+    texts = extract_comments(entry["raw"]) if reparse else entry["records"]
+    comments = [{'content': text, 'sentiment_score': analyze_sentiment(text)} for text in texts]
+    if not comments:
+        return 0
+
+    video_sentiment_score = sum([c['sentiment_score'] for c in comments]) / len(comments)
+    video_id = entry["meta"]["video_id"]
+    title = entry["meta"].get("title") or "No Title"
+    for comment in comments:
+        row_id = save_to_db(
+            video_id=video_id,
+            title=title,
+            sentiment_score=video_sentiment_score,
+            comment=comment,
+            site="youtube",
+            search_keyword=entry["keyword"],
+            capture_date=entry["capture_date"],
+            pause=False
+        )
+        search.index_row("yt", row_id, entry["keyword"], entry["capture_date"], video_url(video_id), title, None,
+                         comment['content'], comment['sentiment_score'], video_sentiment_score)
+    return len(comments)
+
+def main(keywords_file="keywords_yt.txt"):
+    youtube_scraper(keywords_file)
 
 if __name__ == "__main__":
     try: